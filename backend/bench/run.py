@@ -0,0 +1,199 @@
+"""
+Offline benchmark suite.
+
+Generates a synthetic universe in a temp directory, swaps every network
+upstream for a local fake (bench.stubs) and times the hot paths, from
+feature building to end-to-end endpoint throughput. Results are written as
+JSON so runs can be diffed between releases.
+
+Usage (from backend/):
+    python -m bench.run --symbols 50 --years 5 --out bench-results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from bench import stubs
+from bench.synthetic import write_universe
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "min_ms": float(ms.min()),
+        "max_ms": float(ms.max()),
+    }
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def run_serial(fn, items):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return summarize([timed(fn, item) for item in items])
+
+
+def run_concurrent(fn, items, concurrency):
+    """Latency summary plus throughput for items pushed through `concurrency` threads."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(lambda item: timed(fn, item), items))
+        wall = time.perf_counter() - started
+    result = summarize(samples)
+    result.update(concurrency=concurrency, wall_s=wall, throughput_rps=len(items) / wall)
+    return result
+
+
+def wait_ready(client, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get("/ready").status_code == 200:
+            return
+        time.sleep(0.1)
+    raise TimeoutError("app did not become ready")
+
+
+def bench_pipeline(args, data_root, symbols, results):
+    from fetch_history import features, math_predict, train_model
+    from fetch_history.history_pipeline import predict_today
+
+    stock_dir = lambda s: os.path.join(data_root, s)
+
+    results["features.main"] = run_serial(lambda s: features.main(s, stock_dir(s)), symbols)
+
+    X = np.random.default_rng(0).random((int(args.years * 252), len(train_model.FEATURES)))
+    y = np.zeros(len(X))
+    results["make_sequences"] = run_serial(lambda _: train_model.make_sequences(X, y), range(args.repeat))
+
+    trained = symbols[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_s = timed(train_model.train, trained, stock_dir(trained), args.epochs)
+    results["train"] = {"epochs": args.epochs, "total_s": train_s, "per_epoch_s": train_s / args.epochs}
+
+    # Weights don't matter for timing: serve every symbol with the one trained model
+    for s in symbols[1:]:
+        for suffix in ("_reg_model.pth", "_scaler.save"):
+            shutil.copy(os.path.join(stock_dir(trained), f"{trained}{suffix}"),
+                        os.path.join(stock_dir(s), f"{s}{suffix}"))
+
+    results["predict_today.cold"] = run_serial(lambda s: predict_today(s, stock_dir(s)), symbols)
+    warm = [symbols[i % len(symbols)] for i in range(args.requests)]
+    results["predict_today.warm"] = run_serial(lambda s: predict_today(s, stock_dir(s)), warm)
+    results["predict_today.concurrent"] = run_concurrent(
+        lambda s: predict_today(s, stock_dir(s)), warm, args.concurrency)
+
+    import pandas as pd
+    df = pd.read_csv(os.path.join(stock_dir(trained), f"{trained}_features_reg.csv"),
+                     parse_dates=["Date"], index_col="Date")
+    rows = [row for _, row in df.iterrows()]
+    results["simple_decision"] = run_serial(math_predict.simple_decision, rows)
+
+
+def bench_endpoints(args, symbols, results):
+    from fastapi.testclient import TestClient
+    import main
+    import main2
+
+    requests_ = [symbols[i % len(symbols)] for i in range(args.requests)]
+
+    with TestClient(main2.app) as client:
+        wait_ready(client)
+        for route in ("/MathFormula", "/GRURegressor"):
+            def call(s, route=route):
+                r = client.get(route, params={"symbol": s, "fresh": "true"})
+                assert r.status_code == 200 and "error" not in r.json(), r.text
+            results[f"main2 GET {route}"] = run_concurrent(call, requests_, args.concurrency)
+
+    with TestClient(main.app) as client:
+        wait_ready(client)
+        routes = {
+            "/api/start_scan": lambda s: {"ticker": s},
+            "/api/get_news_headlines": lambda s: {"ticker": s},
+            "/api/get_congress_activity": lambda s: {"ticker": s},
+        }
+        for route, body in routes.items():
+            def call(s, route=route, body=body):
+                r = client.post(route, json=body(s))
+                assert r.status_code == 200, r.text
+            results[f"main POST {route}"] = run_concurrent(call, requests_, args.concurrency)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(args):
+    data_root = tempfile.mkdtemp(prefix="sentitrade-bench-")
+    # Must be set before the apps (and math_predict) are imported
+    os.environ["STOCK_DATA_DIR"] = data_root
+    stubs.install(args.upstream_latency_ms)
+
+    results = {}
+    try:
+        symbols = write_universe(data_root, args.symbols, args.years)
+        bench_pipeline(args, data_root, symbols, results)
+        if not args.skip_endpoints:
+            bench_endpoints(args, symbols, results)
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        if "mean_ms" in r:
+            extra = f" | {r['throughput_rps']:.1f} req/s" if "throughput_rps" in r else ""
+            print(f"{name:40s} mean {r['mean_ms']:9.3f} ms | p95 {r['p95_ms']:9.3f} ms{extra}")
+        else:
+            print(f"{name:40s} {r}")
+    print(f"[OK] Benchmark results saved: {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=20, help="synthetic symbols to generate")
+    parser.add_argument("--years", type=float, default=5, help="years of daily bars per symbol")
+    parser.add_argument("--epochs", type=int, default=2, help="training epochs to time")
+    parser.add_argument("--requests", type=int, default=200, help="requests per predict/endpoint benchmark")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions for micro benchmarks")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="simulated latency added to every faked upstream call")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--out", default="bench-results.json")
+    main(parser.parse_args())
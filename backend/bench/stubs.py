@@ -0,0 +1,118 @@
+"""
+Local stand-ins for every network upstream: yfinance, Gemini, NewsAPI,
+AInvest, Wikipedia and the Gumloop webhook. `install()` must run before the
+apps are imported.
+"""
+import json
+import os
+import sys
+import time
+import types
+import zlib
+
+from bench.synthetic import make_ohlcv
+
+UPSTREAM_LATENCY = 0.0
+
+
+def _sleep():
+    if UPSTREAM_LATENCY:
+        time.sleep(UPSTREAM_LATENCY)
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+# ---------- yfinance ----------
+def _yf_download(symbol, period="5y", interval="1d", progress=False, **kwargs):
+    _sleep()
+    years = int(period.rstrip("y")) if period.endswith("y") else 1
+    return make_ohlcv(years * 252, seed=zlib.crc32(symbol.encode()))
+
+
+class _Ticker:
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, period="3mo", auto_adjust=True, **kwargs):
+        _sleep()
+        return make_ohlcv(63, seed=zlib.crc32(self.ticker.encode()))
+
+
+# ---------- google.generativeai ----------
+class _GeminiResponse:
+    text = '```json\n{"tech_score": 30, "pattern_name": "Synthetic Flag"}\n```'
+
+
+class _GenerativeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt):
+        _sleep()
+        return _GeminiResponse()
+
+
+# ---------- requests (NewsAPI, AInvest, Wikipedia, Gumloop) ----------
+_TITLES = [
+    "Shares rally after strong quarterly earnings",
+    "Analysts raise price target on cloud growth",
+    "Company announces new product line at annual event",
+    "Stock slips as supply chain concerns linger",
+]
+
+
+def _fake_get(url, params=None, headers=None, **kwargs):
+    _sleep()
+    if "newsapi.org" in url:
+        articles = [{"title": t, "url": f"https://example.com/{i}", "description": t} for i, t in enumerate(_TITLES * 5)]
+        return FakeResponse({"status": "ok", "articles": articles})
+    if "ainvest.com" in url:
+        data = [{"name": f"Member {i}", "trade_date": "2025-01-02", "type": "buy", "size": "1K-15K"} for i in range(10)]
+        return FakeResponse({"data": {"data": data}})
+    if "wikipedia.org" in url:
+        return FakeResponse({"query": {"pages": {"1": {"original": {"source": "https://example.com/photo.jpg"}}}}})
+    raise RuntimeError(f"Unexpected upstream GET in offline benchmark: {url}")
+
+
+def _fake_post(url, data=None, json=None, headers=None, **kwargs):
+    _sleep()
+    return FakeResponse({"status": "accepted"})
+
+
+def install(latency_ms=0.0):
+    """Replace upstream clients with local fakes; call before importing main/main2."""
+    global UPSTREAM_LATENCY
+    UPSTREAM_LATENCY = latency_ms / 1000.0
+
+    yf = types.ModuleType("yfinance")
+    yf.download = _yf_download
+    yf.Ticker = _Ticker
+    sys.modules["yfinance"] = yf
+
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = _GenerativeModel
+    google = sys.modules.get("google") or types.ModuleType("google")
+    google.generativeai = genai
+    sys.modules["google"] = google
+    sys.modules["google.generativeai"] = genai
+
+    import requests
+    requests.get = _fake_get
+    requests.post = _fake_post
+
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("NEWS_API_KEY", "offline-benchmark")
+    os.environ.setdefault("AI_INVEST_TOKEN", "offline-benchmark")
+    os.environ.setdefault("GUMLOOP_WEBHOOK_URL", "http://gumloop.invalid/webhook")
@@ -0,0 +1,43 @@
+"""
+Synthetic OHLCV data: geometric Brownian motion closes with plausible
+open/high/low/volume around them, on a business-day calendar.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def make_ohlcv(n_days, seed=0, start_price=100.0, end=None):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end or pd.Timestamp.today().normalize(), periods=n_days, name="Date")
+
+    rets = rng.normal(0.0003, 0.015, n_days)
+    close = start_price * np.exp(np.cumsum(rets))
+    open_ = close * np.exp(rng.normal(0, 0.005, n_days))
+    spread = np.abs(rng.normal(0, 0.01, n_days))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(15, 0.4, n_days).round()
+
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=dates,
+    )
+
+
+def symbol_names(n):
+    return [f"SYN{i:04d}" for i in range(n)]
+
+
+def write_universe(data_root, n_symbols, years):
+    """Write {data_root}/{SYMBOL}/{SYMBOL}_data.csv for n_symbols synthetic tickers."""
+    symbols = symbol_names(n_symbols)
+    n_days = int(years * TRADING_DAYS)
+    for i, symbol in enumerate(symbols):
+        stock_dir = os.path.join(data_root, symbol)
+        os.makedirs(stock_dir, exist_ok=True)
+        make_ohlcv(n_days, seed=i).to_csv(os.path.join(stock_dir, f"{symbol}_data.csv"))
+    return symbols
@@ -0,0 +1,11 @@
+"""
+Columns each consumer reads from *_features_reg.csv. Kept free of imports so
+the API process can use it without loading features.py, which silences
+warnings process-wide when imported.
+"""
+
+# ("gru" is train_model.FEATURES plus the training target)
+CONSUMER_COLS = {
+    "gru": ["Close", "Volume", "RSI", "MACD", "ATR_pct", "ret_1d", "ret_5d", "trend_50", "vol_norm", "target"],
+    "math": ["ret_1d", "RSI", "trend_50", "MACD"],
+}
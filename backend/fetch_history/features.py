@@ -1,8 +1,15 @@
 # build_features_regression_final.py
 import argparse
+import math
 import pandas as pd
 import numpy as np
 import warnings
+try:
+    from .columns import CONSUMER_COLS
+    from .io_utils import atomic_path
+except ImportError:
+    from columns import CONSUMER_COLS
+    from io_utils import atomic_path
 
 warnings.filterwarnings("ignore")
 
@@ -13,65 +20,212 @@ def rsi(series, window=14):
     rs = gain / loss
     return 100 - (100 / (1 + rs))
 
-def main(symbol, output_dir):
-    df = pd.read_csv(
-        f"{output_dir}/{symbol}_data.csv",
-        parse_dates=["Date"],
-        index_col="Date"
+# ---------- FEATURE REGISTRY ----------
+# Every column is declared once with its inputs (raw OHLCV fields or other
+# registered columns), its lookback (rows of its inputs, including the current
+# one, it needs to produce a value) and its dtype. compute() evaluates only the
+# dependency closure of the requested columns, each node once, so shared
+# intermediates (EMAs, true range, SMA-50) are never computed twice.
+RAW_COLS = ["Open", "High", "Low", "Close", "Volume"]
+# EMAs depend on all history; lookbacks size them so truncated history moves the
+# value by at most about EWM_TOLERANCE x price (an approximation, not exact)
+EWM_TOLERANCE = 1e-6
+REGISTRY = {}
+
+class Feature:
+    def __init__(self, name, inputs, lookback, dtype, fn, intermediate):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.lookback = lookback
+        self.dtype = dtype
+        self.fn = fn
+        self.intermediate = intermediate
+
+def feature(name, inputs, lookback=1, dtype="float64", intermediate=False):
+    """Register fn(*inputs) as the definition of column `name`."""
+    def register(fn):
+        REGISTRY[name] = Feature(name, inputs, lookback, dtype, fn, intermediate)
+        return fn
+    return register
+
+def ewm_lookback(span, tol=EWM_TOLERANCE):
+    """
+    Rows of history for an ewm(span) mean computed on a truncated series to
+    approximate the full-history value. The dropped history carries at most
+    `tol` of the weight, so the error is about `tol` times the price level
+    (larger relative to small values such as MACD near zero crossings).
+    """
+    return math.ceil(math.log(tol) / math.log(1 - 2 / (span + 1)))
+
+# -------- RETURNS --------
+@feature("ret_1d", ["Close"], lookback=2)
+def _ret_1d(close):
+    return close.pct_change()
+
+@feature("ret_5d", ["Close"], lookback=6)
+def _ret_5d(close):
+    return close.pct_change(5)
+
+# -------- TREND --------
+@feature("sma_10", ["Close"], lookback=10)
+def _sma_10(close):
+    return close.rolling(10).mean()
+
+@feature("sma_20", ["Close"], lookback=20)
+def _sma_20(close):
+    return close.rolling(20).mean()
+
+@feature("sma_50", ["Close"], lookback=50)
+def _sma_50(close):
+    return close.rolling(50).mean()
+
+@feature("trend_50", ["Close", "sma_50"])
+def _trend_50(close, sma_50):
+    return close / sma_50
+
+# -------- MOMENTUM --------
+@feature("RSI", ["Close"], lookback=15)
+def _rsi(close):
+    return rsi(close)
+
+@feature("ema_12", ["Close"], lookback=ewm_lookback(12), intermediate=True)
+def _ema_12(close):
+    return close.ewm(span=12).mean()
+
+@feature("ema_26", ["Close"], lookback=ewm_lookback(26), intermediate=True)
+def _ema_26(close):
+    return close.ewm(span=26).mean()
+
+@feature("MACD", ["ema_12", "ema_26"])
+def _macd(ema_12, ema_26):
+    return ema_12 - ema_26
+
+# -------- VOLATILITY (ATR) --------
+@feature("true_range", ["High", "Low", "Close"], lookback=2, intermediate=True)
+def _true_range(high, low, close):
+    # fmax skips NaN like a row-wise max, so the first bar's range is kept
+    return np.fmax(np.fmax(
+        high - low,
+        (high - close.shift()).abs()),
+        (low - close.shift()).abs()
     )
 
-    df = df.astype(float)
+@feature("ATR", ["true_range"], lookback=14)
+def _atr(true_range):
+    return true_range.rolling(14).mean()
+
+@feature("ATR_pct", ["ATR", "Close"])
+def _atr_pct(atr, close):
+    return atr / close
+
+# -------- VOLUME --------
+@feature("vol_chg", ["Volume"], lookback=2)
+def _vol_chg(volume):
+    return volume.pct_change()
+
+@feature("vol_norm", ["Volume"], lookback=20)
+def _vol_norm(volume):
+    return volume / volume.rolling(20).mean()
+
+# -------- TARGET (REGRESSION) --------
+# Log return for next 5 days (looks forward, so it has no lookback)
+@feature("target", ["Close"])
+def _target(close):
+    return np.log(close.shift(-5) / close)
+
+# Every registered feature column (intermediates and the target excluded)
+FEATURE_COLS = [name for name, f in REGISTRY.items() if not f.intermediate and name != "target"]
 
-    # -------- RETURNS --------
-    df["ret_1d"] = df["Close"].pct_change()
-    df["ret_5d"] = df["Close"].pct_change(5)
+# What features.py persists by default: every registered column some consumer reads
+PERSISTED_COLS = [name for name in REGISTRY if any(name in cols for cols in CONSUMER_COLS.values())]
 
-    # -------- TREND --------
-    df["sma_10"] = df["Close"].rolling(10).mean()
-    df["sma_20"] = df["Close"].rolling(20).mean()
-    df["sma_50"] = df["Close"].rolling(50).mean()
-    df["trend_50"] = df["Close"] / df["sma_50"]
+def resolve(columns):
+    """Dependency closure of `columns` in evaluation order (inputs first)."""
+    order, seen = [], set()
+    def visit(name):
+        if name in seen or name in RAW_COLS:
+            return
+        if name not in REGISTRY:
+            raise KeyError(f"Unknown feature column {name!r}")
+        seen.add(name)
+        for dep in REGISTRY[name].inputs:
+            visit(dep)
+        order.append(name)
+    for name in columns:
+        visit(name)
+    return order
 
-    # -------- MOMENTUM --------
-    df["RSI"] = rsi(df["Close"])
+def lookback(columns):
+    """Rows of OHLCV history, including the current row, needed for every column to have a value."""
+    memo = {}
+    def rows(name):
+        if name in RAW_COLS:
+            return 1
+        if name not in memo:
+            f = REGISTRY[name]
+            memo[name] = f.lookback + max(rows(dep) for dep in f.inputs) - 1
+        return memo[name]
+    return max((rows(c) for c in columns), default=1)
 
-    # MACD
-    ema12 = df["Close"].ewm(span=12).mean()
-    ema26 = df["Close"].ewm(span=26).mean()
-    df["MACD"] = ema12 - ema26
+def history_rows(columns, rows=1):
+    """OHLCV rows to read so that the last `rows` rows have every column in `columns`."""
+    return rows + lookback(columns) - 1
 
-    # -------- VOLATILITY (ATR) --------
-    tr = pd.concat([
-        df["High"] - df["Low"],
-        (df["High"] - df["Close"].shift()).abs(),
-        (df["Low"] - df["Close"].shift()).abs()
-    ], axis=1).max(axis=1)
+def compute(inputs, columns):
+    """
+    {name: values} for the requested columns, from {"Close": ..., "High": ...}
+    inputs. Works column-wise, so the inputs can be one symbol's Series or
+    aligned (date x symbol) DataFrames.
+    """
+    values = dict(inputs)
+    for name in resolve(columns):
+        f = REGISTRY[name]
+        values[name] = f.fn(*(values[dep] for dep in f.inputs)).astype(f.dtype)
+    return {name: values[name] for name in columns if name not in RAW_COLS}
 
-    df["ATR"] = tr.rolling(14).mean()
-    df["ATR_pct"] = df["ATR"] / df["Close"]
+def indicators(close, high, low, volume, columns=PERSISTED_COLS):
+    """Feature and target columns from OHLCV inputs (see compute)."""
+    return compute({"Close": close, "High": high, "Low": low, "Volume": volume}, columns)
 
-    # -------- VOLUME --------
-    df["vol_chg"] = df["Volume"].pct_change()
-    df["vol_norm"] = df["Volume"] / df["Volume"].rolling(20).mean()
+def dropna_cols(columns):
+    """Computed columns whose NaN warm-up rows are dropped (target NaNs are kept)."""
+    return [c for c in columns if c in REGISTRY and c != "target"]
 
-    # -------- TARGET (REGRESSION) --------
-    # Log return for next 5 days
-    df["target"] = np.log(df["Close"].shift(-5) / df["Close"])
+def build_features(df, columns=PERSISTED_COLS):
+    """OHLCV frame -> features frame in the *_features_reg.csv schema."""
+    df = df.astype(float)
+    for name, values in indicators(df["Close"], df["High"], df["Low"], df["Volume"], columns).items():
+        df[name] = values
 
     # -------- DROP ROWS ONLY IF FEATURES ARE NaN --------
-    feature_cols = [
-        "ret_1d", "ret_5d", "sma_10", "sma_20", "sma_50", "trend_50",
-        "RSI", "MACD", "ATR", "ATR_pct", "vol_chg", "vol_norm"
-    ]
-    df.dropna(subset=feature_cols, inplace=True)
+    df.dropna(subset=dropna_cols(columns), inplace=True)
+    return df
+
+def main(symbol, output_dir, columns=PERSISTED_COLS):
+    df = pd.read_csv(
+        f"{output_dir}/{symbol}_data.csv",
+        parse_dates=["Date"],
+        index_col="Date"
+    )
+
+    df = build_features(df, columns)
 
     # Now the last 5 rows are kept (target NaN) for testing/demo
-    df.to_csv(f"{output_dir}/{symbol}_features_reg.csv")
+    with atomic_path(f"{output_dir}/{symbol}_features_reg.csv") as tmp:
+        df.to_csv(tmp)
     print(f"[OK] Regression features saved: {output_dir}/{symbol}_features_reg.csv")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("symbol")
     parser.add_argument("output_dir", nargs="?", default=".")
+    parser.add_argument("--columns", help="comma-separated columns to compute (default: what the consumers read)")
+    parser.add_argument("--all", action="store_true", help="compute every registered non-intermediate column")
     args = parser.parse_args()
-    main(args.symbol, args.output_dir)
+    if args.all:
+        columns = FEATURE_COLS + ["target"]
+    elif args.columns:
+        columns = [c.strip() for c in args.columns.split(",") if c.strip()]
+    else:
+        columns = PERSISTED_COLS
+    main(args.symbol, args.output_dir, columns)
@@ -1,10 +1,22 @@
 import argparse, yfinance as yf, pandas as pd, sys
 import os
+try:
+    from .features import CONSUMER_COLS, history_rows
+    from .io_utils import atomic_path
+except ImportError:
+    from features import CONSUMER_COLS, history_rows
+    from io_utils import atomic_path
 
-def main(symbol, output_dir):
-    print(f"Fetching 5 years data for {symbol}...")
-    
-    df = yf.download(symbol, period="5y", interval="1d", progress=False)
+def main(symbol, output_dir, rows=None):
+    """Save daily OHLCV for symbol: 5 years, or only the last `rows` trading days."""
+    if rows:
+        # ~252 trading days per 365 calendar days, plus slack for holidays
+        start = pd.Timestamp.today().normalize() - pd.Timedelta(days=int(rows * 365 / 252) + 10)
+        print(f"Fetching last {rows} days of data for {symbol}...")
+        df = yf.download(symbol, start=start.strftime("%Y-%m-%d"), interval="1d", progress=False)
+    else:
+        print(f"Fetching 5 years data for {symbol}...")
+        df = yf.download(symbol, period="5y", interval="1d", progress=False)
     
     if df.empty:
         print(f"No data for {symbol}")
@@ -15,14 +27,22 @@ def main(symbol, output_dir):
     
     df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
     df.sort_index(inplace=True)
+    if rows:
+        df = df.iloc[-rows:]
     
     output_file = os.path.join(output_dir, f"{symbol}_data.csv")
-    df.to_csv(output_file)
+    with atomic_path(output_file) as tmp:
+        df.to_csv(tmp)
     print(f"[OK] Saved: {output_file}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("symbol")
     parser.add_argument("output_dir")
+    parser.add_argument("--rows", type=int,
+                        help="only fetch enough history for this many feature rows (default: 5 years)")
+    parser.add_argument("--consumer", choices=sorted(CONSUMER_COLS), default="gru",
+                        help="whose feature columns --rows is sized for")
     args = parser.parse_args()
-    main(args.symbol, args.output_dir)
\ No newline at end of file
+    rows = history_rows(CONSUMER_COLS[args.consumer], args.rows) if args.rows else None
+    main(args.symbol, args.output_dir, rows)
\ No newline at end of file
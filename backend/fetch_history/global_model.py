@@ -0,0 +1,198 @@
+"""
+Global multi-symbol GRU: one model trained over pooled windows from many
+symbols, with per-symbol MinMax normalization and a learned symbol embedding.
+
+Usage: python global_model.py AAPL MSFT GOOG ... [--data-root stocks_data]
+"""
+import argparse
+import os
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import MinMaxScaler
+
+try:
+    from .io_utils import atomic_path
+    from .train_model import FEATURES, SEQ_LEN
+except ImportError:
+    from io_utils import atomic_path
+    from train_model import FEATURES, SEQ_LEN
+
+DEFAULT_DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stocks_data")
+MODEL_FILE = "global_reg_model.pth"
+SCALERS_FILE = "global_scalers.save"
+EMB_DIM = 8
+UNKNOWN_SYMBOL = 0        # embedding row used for symbols not seen in training
+UNKNOWN_DROP_PROB = 0.1   # fraction of training windows tagged UNKNOWN so that row is learned
+
+
+class GlobalGRURegressor(nn.Module):
+    def __init__(self, input_size, n_symbols, emb_dim=EMB_DIM):
+        super().__init__()
+        # Row 0 is reserved for unseen symbols
+        self.embedding = nn.Embedding(n_symbols + 1, emb_dim)
+        self.gru = nn.GRU(input_size + emb_dim, 64, num_layers=2, batch_first=True)
+        self.fc = nn.Linear(64, 1)
+
+    def forward(self, x, symbol_idx):
+        emb = self.embedding(symbol_idx).unsqueeze(1).expand(-1, x.size(1), -1)
+        out, _ = self.gru(torch.cat([x, emb], dim=2))
+        return self.fc(out[:, -1]).squeeze(1)
+
+
+def global_model_path(data_root=DEFAULT_DATA_ROOT):
+    return os.path.join(data_root, MODEL_FILE)
+
+
+def global_scalers_path(data_root=DEFAULT_DATA_ROOT):
+    return os.path.join(data_root, SCALERS_FILE)
+
+
+def load_features(symbol, data_root):
+    return pd.read_csv(
+        os.path.join(data_root, symbol, f"{symbol}_features_reg.csv"),
+        parse_dates=["Date"],
+        index_col="Date"
+    )
+
+
+def fit_symbol_scaler(df):
+    """Per-symbol normalization, fitted on the same 80% train split as train_model."""
+    split = int(len(df) * 0.8)
+    scaler = MinMaxScaler()
+    scaler.fit(df[FEATURES].iloc[:split])
+    return scaler
+
+
+def window_batches(values, starts, batch_size, shuffle=True):
+    """
+    Yield (window indices, (B, SEQ_LEN, F) windows), cutting each batch's
+    windows out of `values` by index. Window i is values[starts[i]:starts[i] + SEQ_LEN],
+    so only the rows are held in memory, never SEQ_LEN copies of them.
+    """
+    order = torch.randperm(len(starts)) if shuffle else torch.arange(len(starts))
+    offsets = torch.arange(SEQ_LEN)
+    for idx in order.split(batch_size):
+        yield idx, values[starts[idx, None] + offsets]
+
+
+def train_global(symbols, data_root=DEFAULT_DATA_ROOT, epochs=40, batch_size=256):
+    symbols = [s.upper() for s in symbols]
+    vocab = {}
+    scalers = {}
+    # Scaled rows of every symbol back to back, plus the first row of each training window
+    rows, starts, ids, ys = [], [], [], []
+    offset = 0
+
+    for symbol in symbols:
+        try:
+            df = load_features(symbol, data_root)
+        except FileNotFoundError:
+            print(f"[WARNING] No features for {symbol}, skipping")
+            continue
+
+        split = int(len(df) * 0.8)
+        scaler = fit_symbol_scaler(df)
+        train_df = df.iloc[:split].dropna(subset=["target"])
+        values = scaler.transform(train_df[FEATURES]).astype(np.float32)
+        # Same windows as make_sequences: SEQ_LEN rows predict the next row's target
+        n_windows = len(values) - SEQ_LEN
+        if n_windows <= 0:
+            print(f"[WARNING] Not enough history for {symbol}, skipping")
+            continue
+
+        vocab[symbol] = len(vocab) + 1
+        scalers[symbol] = scaler
+        rows.append(values)
+        starts.append(offset + np.arange(n_windows))
+        ys.append(train_df["target"].to_numpy(dtype=np.float32)[SEQ_LEN:])
+        ids.append(np.full(n_windows, vocab[symbol], dtype=np.int64))
+        offset += len(values)
+        print(f"[INFO] {symbol}: {n_windows} windows")
+
+    if not vocab:
+        raise ValueError("No symbols with usable features to train the global model")
+
+    values = torch.from_numpy(np.concatenate(rows))
+    starts = torch.from_numpy(np.concatenate(starts))
+    y = torch.from_numpy(np.concatenate(ys))
+    sym = torch.from_numpy(np.concatenate(ids))
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = GlobalGRURegressor(len(FEATURES), len(vocab)).to(device)
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+
+    for epoch in range(epochs):
+        model.train()
+        losses = []
+        for idx, xb in window_batches(values, starts, batch_size):
+            xb, sb, yb = xb.to(device), sym[idx].to(device), y[idx].to(device)
+            sb = sb.masked_fill(torch.rand(sb.shape, device=device) < UNKNOWN_DROP_PROB, UNKNOWN_SYMBOL)
+            optimizer.zero_grad()
+            loss = criterion(model(xb, sb), yb)
+            loss.backward()
+            optimizer.step()
+            losses.append(loss.item())
+        if epoch % 10 == 0:
+            print(f"Epoch {epoch} | MSE {np.mean(losses):.6f}")
+
+    os.makedirs(data_root, exist_ok=True)
+    # Scalers first: a reader that sees the new model must find matching scalers
+    with atomic_path(global_scalers_path(data_root)) as tmp:
+        joblib.dump(scalers, tmp)
+    with atomic_path(global_model_path(data_root)) as tmp:
+        torch.save({"model": model.state_dict(), "symbols": vocab, "emb_dim": EMB_DIM}, tmp)
+    print(f"[OK] Global model saved for {len(vocab)} symbols")
+    return model
+
+
+# Resident global model, reloaded only when the .pth file changes
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def load_global_model(data_root=DEFAULT_DATA_ROOT):
+    """Return (model, vocab, scalers) for the global model under data_root."""
+    model_path = global_model_path(data_root)
+    mtime = os.path.getmtime(model_path)
+    with _CACHE_LOCK:
+        cached = _CACHE.get(model_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    checkpoint = torch.load(model_path, map_location=device)
+    vocab = checkpoint["symbols"]
+    model = GlobalGRURegressor(len(FEATURES), len(vocab), checkpoint.get("emb_dim", EMB_DIM)).to(device)
+    model.load_state_dict(checkpoint["model"])
+    model.eval()
+    scalers = joblib.load(global_scalers_path(data_root))
+
+    with _CACHE_LOCK:
+        _CACHE[model_path] = (mtime, (model, vocab, scalers))
+    return model, vocab, scalers
+
+
+def symbol_inputs(symbol, vocab, scalers):
+    """
+    Embedding index and scaler for symbol; unseen symbols get UNKNOWN. `scalers`
+    must hold a scaler for an unseen symbol too, fitted on its full history
+    with fit_symbol_scaler (a few prediction rows are not enough to fit one).
+    """
+    if symbol not in scalers:
+        raise KeyError(f"No scaler for {symbol}; fit one on its full history with fit_symbol_scaler")
+    return vocab.get(symbol, UNKNOWN_SYMBOL), scalers[symbol]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--data-root", default=DEFAULT_DATA_ROOT)
+    parser.add_argument("--epochs", type=int, default=40)
+    args = parser.parse_args()
+    train_global(args.symbols, args.data_root, args.epochs)
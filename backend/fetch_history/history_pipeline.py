@@ -1,61 +1,177 @@
 """
 Pipeline: fetch → features → train/load → predict today
 """
-import argparse, os, subprocess, sys
+import argparse, logging, os, subprocess, sys, threading, time
+from collections import OrderedDict
+import numpy as np
 import torch
 import pandas as pd
-from .train_model import GRURegressor, FEATURES, SEQ_LEN, THRESH_MULT
+from .train_model import GRURegressor, FEATURES, SEQ_LEN, THRESH_MULT, make_windows, get_signals
+from .inference import get_executor
+from .io_utils import pipeline_lock, read_csv_tail
+from .global_model import fit_symbol_scaler, global_model_path, load_global_model, symbol_inputs
 import joblib
+from services.log import configure_logging
+from services.metrics import cache_result, stage
 
-def predict_today(symbol, stock_dir):
-    model_path = os.path.join(stock_dir, f"{symbol}_reg_model.pth")
-    scaler_path = os.path.join(stock_dir, f"{symbol}_scaler.save")
+log = logging.getLogger(__name__)
+
+# Loaded models keyed by path, invalidated when the .pth file is rewritten
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+# Scalers fitted for symbols the global model never saw, keyed by symbol and
+# invalidated when the features file is rewritten
+_UNSEEN_SCALERS = {}
+_UNSEEN_SCALERS_LOCK = threading.Lock()
+
+# predict_range results keyed by (symbol, model mtime, features mtime, start, end)
+RANGE_CACHE_SIZE = 256
+RANGE_BATCH_SIZE = 512
+_RANGE_CACHE = OrderedDict()
+_RANGE_CACHE_LOCK = threading.Lock()
+
+# "symbol" serves each ticker's own model, "global" the shared multi-symbol model
+GRU_MODEL = os.getenv("GRU_MODEL", "symbol")
+MODEL_KINDS = ("symbol", "global")
+
+# predict_today reads only the last SEQ_LEN rows of these columns
+PREDICT_COLS = FEATURES + ["ATR_pct"]
+
+def load_model(model_path):
+    """Return an eval-mode GRURegressor for model_path, reusing a cached copy."""
+    mtime = os.path.getmtime(model_path)
+    with _MODEL_CACHE_LOCK:
+        cached = _MODEL_CACHE.get(model_path)
+        if cached is not None and cached[0] == mtime:
+            cache_result("model", True)
+            return cached[1]
+    cache_result("model", False)
+    with stage("model_load"):
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model = GRURegressor(len(FEATURES)).to(device)
+        model.load_state_dict(torch.load(model_path, map_location=device))
+        model.eval()
+    with _MODEL_CACHE_LOCK:
+        _MODEL_CACHE[model_path] = (mtime, model)
+    return model
+
+def unseen_symbol_scaler(symbol, features_file):
+    """Global-model scaler for a symbol outside its vocabulary, fitted once per features file version."""
+    mtime = os.path.getmtime(features_file)
+    with _UNSEEN_SCALERS_LOCK:
+        cached = _UNSEEN_SCALERS.get(symbol)
+        if cached is not None and cached[0] == mtime:
+            cache_result("unseen_scaler", True)
+            return cached[1]
+    cache_result("unseen_scaler", False)
+    with stage("scaler_fit"):
+        scaler = fit_symbol_scaler(pd.read_csv(features_file, parse_dates=["Date"], index_col="Date"))
+    with _UNSEEN_SCALERS_LOCK:
+        _UNSEEN_SCALERS[symbol] = (mtime, scaler)
+    return scaler
+
+def artifacts_ready(symbol, stock_dir, model_kind=None):
+    """True if predict_today can answer for symbol without running the pipeline."""
+    model_kind = model_kind or GRU_MODEL
     features_file = os.path.join(stock_dir, f"{symbol}_features_reg.csv")
+    if model_kind == "global":
+        model_path = global_model_path(os.path.dirname(os.path.abspath(stock_dir)))
+        return os.path.exists(model_path) and os.path.exists(features_file)
+    return (
+        os.path.exists(os.path.join(stock_dir, f"{symbol}_reg_model.pth"))
+        and os.path.exists(os.path.join(stock_dir, f"{symbol}_scaler.save"))
+        and os.path.exists(features_file)
+    )
 
-    # If any file is missing, run the pipeline to generate them
-    if not (os.path.exists(model_path) and os.path.exists(features_file) and os.path.exists(scaler_path)):
-        print(f"[WARNING] Missing files for {symbol}. Running pipeline...")
-        run_pipeline(symbol, stock_dir)
-        # After running, check again
-        if not (os.path.exists(model_path) and os.path.exists(features_file) and os.path.exists(scaler_path)):
-            raise FileNotFoundError(f"Model, scaler, or features file not found for {symbol} after running pipeline. Cannot predict today.")
+def predict_today(symbol, stock_dir, model_kind=None):
+    return predict_details(symbol, stock_dir, model_kind)["decision"]
+
+def predict_details(symbol, stock_dir, model_kind=None):
+    """Today's decision plus the predicted 5-day return, ATR threshold and as-of date."""
+    model_kind = model_kind or GRU_MODEL
+    if model_kind not in MODEL_KINDS:
+        raise ValueError(f"Unknown model kind {model_kind!r}, expected one of {MODEL_KINDS}")
+
+    features_file = os.path.join(stock_dir, f"{symbol}_features_reg.csv")
+    if model_kind == "global":
+        # One shared model under the data root; only the features file is per symbol
+        model_path = global_model_path(os.path.dirname(os.path.abspath(stock_dir)))
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Global model not found at {model_path}. Train it with global_model.py.")
+        if not os.path.exists(features_file):
+            # Concurrent callers wait here for one pipeline run instead of starting their own
+            with pipeline_lock(symbol, stock_dir):
+                if not os.path.exists(features_file):
+                    log.warning("Missing features, running pipeline without training", extra={"symbol": symbol})
+                    run_pipeline(symbol, stock_dir, train=False)
+            if not os.path.exists(features_file):
+                raise FileNotFoundError(f"Features file not found for {symbol} after running pipeline. Cannot predict today.")
+    else:
+        model_path = os.path.join(stock_dir, f"{symbol}_reg_model.pth")
+        scaler_path = os.path.join(stock_dir, f"{symbol}_scaler.save")
+
+        def ready():
+            return artifacts_ready(symbol, stock_dir, "symbol")
 
-    # Load CSV
+        # If any file is missing, run the pipeline to generate them. Concurrent
+        # callers (threads or worker processes) wait on one in-flight run.
+        if not ready():
+            with pipeline_lock(symbol, stock_dir):
+                if not ready():
+                    log.warning("Missing artifacts, running pipeline", extra={"symbol": symbol})
+                    run_pipeline(symbol, stock_dir, predict=False)
+            # After running, check again
+            if not ready():
+                raise FileNotFoundError(f"Model, scaler, or features file not found for {symbol} after running pipeline. Cannot predict today.")
+
+    # Load the last SEQ_LEN rows
     try:
-        df = pd.read_csv(features_file, parse_dates=["Date"], index_col="Date")
+        with stage("csv_load"):
+            df = read_csv_tail(features_file, SEQ_LEN, PREDICT_COLS)
         if df.empty:
             raise ValueError(f"Features file for {symbol} is empty")
     except Exception as e:
         raise FileNotFoundError(f"Failed to load features file for {symbol}: {str(e)}")
 
-    # Load scaler
-    try:
-        scaler = joblib.load(scaler_path)
-    except Exception as e:
-        raise FileNotFoundError(f"Failed to load scaler for {symbol}: {str(e)}")
+    # Load model and scaler
+    if model_kind == "global":
+        try:
+            model, vocab, scalers = load_global_model(os.path.dirname(model_path))
+            if symbol not in scalers:
+                # Unseen symbols get their own scaler (fitted on the full history, so cached)
+                scalers = {**scalers, symbol: unseen_symbol_scaler(symbol, features_file)}
+            symbol_idx, scaler = symbol_inputs(symbol, vocab, scalers)
+        except Exception as e:
+            raise FileNotFoundError(f"Failed to load global model for {symbol}: {str(e)}")
+        extra_inputs = (np.int64(symbol_idx),)
+    else:
+        try:
+            with stage("scaler_load"):
+                scaler = joblib.load(scaler_path)
+        except Exception as e:
+            raise FileNotFoundError(f"Failed to load scaler for {symbol}: {str(e)}")
 
-    # Load model
-    try:
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        model = GRURegressor(len(FEATURES)).to(device)
-        model.load_state_dict(torch.load(model_path, map_location=device))
-        model.eval()
-    except Exception as e:
-        raise FileNotFoundError(f"Failed to load model for {symbol}: {str(e)}")
+        try:
+            model = load_model(model_path)
+        except Exception as e:
+            raise FileNotFoundError(f"Failed to load model for {symbol}: {str(e)}")
+        extra_inputs = ()
 
     # Prepare last SEQ_LEN days
     try:
         if len(df) < SEQ_LEN:
             raise ValueError(f"Insufficient data for {symbol}: need {SEQ_LEN} days, have {len(df)}")
-        last_seq = scaler.transform(df[FEATURES].iloc[-SEQ_LEN:])
-        last_seq_tensor = torch.tensor(last_seq, dtype=torch.float32).unsqueeze(0).to(device)
+        with stage("scaler_transform"):
+            last_seq = scaler.transform(df[FEATURES].iloc[-SEQ_LEN:]).astype(np.float32)
     except Exception as e:
         raise ValueError(f"Failed to prepare data for {symbol}: {str(e)}")
 
-    # Run model prediction
+    # Run model prediction (batched with concurrent requests for the same model)
     try:
-        with torch.no_grad():
-            pred_today = model(last_seq_tensor).item()
+        # Includes time queued for the batch; the executor times the pass itself
+        with stage("predict_wait"):
+            pred_today = get_executor().predict(model_path, model, last_seq, *extra_inputs)
     except Exception as e:
         raise RuntimeError(f"Model prediction failed for {symbol}: {str(e)}")
 
@@ -66,30 +182,89 @@ def predict_today(symbol, stock_dir):
         raise ValueError(f"Failed to get ATR for {symbol}: {str(e)}")
 
     if pred_today > THRESH_MULT * atr_today:
-        return "BUY"
+        decision = "BUY"
     elif pred_today < -THRESH_MULT * atr_today:
-        return "SELL"
+        decision = "SELL"
     else:
-        return "HOLD"
+        decision = "HOLD"
 
-def run_pipeline(symbol, stock_dir=None):
-    symbol = symbol.upper()
-    
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # If stock_dir is not provided, use default relative path
-    if stock_dir is None:
-        stock_dir = os.path.join(script_dir, "stocks_data", symbol)
+    return {
+        "decision": decision,
+        "predicted_return": float(pred_today),
+        "atr_threshold": float(THRESH_MULT * atr_today),
+        "as_of": df.index[-1].strftime("%Y-%m-%d"),
+        "model_kind": model_kind,
+    }
+
+def batched_forward(model, windows, batch_size=RANGE_BATCH_SIZE):
+    """Run (N, SEQ_LEN, F) windows through model in no-grad batches, returning N predictions."""
+    device = next(model.parameters()).device
+    preds = np.empty(len(windows), dtype=np.float32)
+    with torch.no_grad():
+        for i in range(0, len(windows), batch_size):
+            batch = torch.from_numpy(np.ascontiguousarray(windows[i:i + batch_size], dtype=np.float32)).to(device)
+            preds[i:i + len(batch)] = model(batch).cpu().numpy()
+    return preds
+
+def predict_range(symbol, stock_dir, start=None, end=None):
+    """
+    Predicted 5-day return, ATR threshold and decision for every date in
+    [start, end] that has SEQ_LEN rows of history. All windows are strided
+    views over one scaled array and go through the model in a few batches.
+    """
+    model_path = os.path.join(stock_dir, f"{symbol}_reg_model.pth")
+    scaler_path = os.path.join(stock_dir, f"{symbol}_scaler.save")
+    features_file = os.path.join(stock_dir, f"{symbol}_features_reg.csv")
+
+    if not (os.path.exists(model_path) and os.path.exists(features_file) and os.path.exists(scaler_path)):
+        raise FileNotFoundError(f"Model, scaler, or features file not found for {symbol}. Cannot predict range.")
+
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    key = (symbol, os.path.getmtime(model_path), os.path.getmtime(features_file), start, end)
+    with _RANGE_CACHE_LOCK:
+        if key in _RANGE_CACHE:
+            _RANGE_CACHE.move_to_end(key)
+            cache_result("predict_range", True)
+            return _RANGE_CACHE[key]
+    cache_result("predict_range", False)
+
+    df = pd.read_csv(features_file, parse_dates=["Date"], index_col="Date")
+    scaler = joblib.load(scaler_path)
+    model = load_model(model_path)
+
+    # Window for date at position pos covers rows pos-SEQ_LEN+1 .. pos
+    first = SEQ_LEN - 1
+    if start is not None:
+        first = max(first, int(df.index.searchsorted(start, side="left")))
+    last = len(df) if end is None else int(df.index.searchsorted(end, side="right"))
+    if first >= last:
+        results = []
     else:
-        # Ensure stock_dir is absolute
-        if not os.path.isabs(stock_dir):
-            stock_dir = os.path.abspath(stock_dir)
-    
-    os.makedirs(stock_dir, exist_ok=True)
+        X = scaler.transform(df[FEATURES].iloc[first - SEQ_LEN + 1:last]).astype(np.float32)
+        preds = batched_forward(model, make_windows(X))
+
+        atrs = df["ATR_pct"].to_numpy()[first:last]
+        decisions = get_signals(preds, atrs)
+        dates = df.index[first:last].strftime("%Y-%m-%d")
+        results = [
+            {
+                "date": date,
+                "predicted_return": float(pred),
+                "atr_threshold": float(THRESH_MULT * atr),
+                "decision": str(decision),
+            }
+            for date, pred, atr, decision in zip(dates, preds, atrs, decisions)
+        ]
 
-    print(f"[PIPELINE] Starting pipeline for {symbol}")
-    print(f"[INFO] Stock directory: {stock_dir}")
+    with _RANGE_CACHE_LOCK:
+        _RANGE_CACHE[key] = results
+        if len(_RANGE_CACHE) > RANGE_CACHE_SIZE:
+            _RANGE_CACHE.popitem(last=False)
+    return results
+
+def _run_stages(symbol, stock_dir, script_dir, train):
+    log.info("Starting pipeline", extra={"symbol": symbol, "stock_dir": stock_dir})
 
     model_path = os.path.join(stock_dir, f"{symbol}_reg_model.pth")
 
@@ -97,44 +272,78 @@ def run_pipeline(symbol, stock_dir=None):
     for script_name in ["fetch_data.py", "features.py"]:
         script_path = os.path.join(script_dir, script_name)
         if not os.path.exists(script_path):
-            print(f"[ERROR] Script not found: {script_path}")
+            log.error("Script not found", extra={"script": script_path})
             continue
         cmd = [sys.executable, script_path, symbol, stock_dir]
-        print(f"  [RUNNING] {script_name}")
+        log.info("Running stage", extra={"symbol": symbol, "script": script_name})
+        started = time.perf_counter()
         try:
-            result = subprocess.run(cmd, check=True, cwd=script_dir, capture_output=True, text=True)
-            print(f"  [OK] {script_name} completed")
+            with stage(f"pipeline_{script_name[:-3]}"):
+                subprocess.run(cmd, check=True, cwd=script_dir, capture_output=True, text=True)
+            log.info("Stage completed", extra={"symbol": symbol, "script": script_name,
+                                                "seconds": round(time.perf_counter() - started, 3)})
         except subprocess.CalledProcessError as e:
-            print(f"  [ERROR] {script_name} failed: {e}")
-            print(f"  Error output: {e.stderr}")
+            log.error("Stage failed", extra={"symbol": symbol, "script": script_name, "error": str(e), "stderr": e.stderr})
             raise
 
+    # Serving from the global model only needs fresh features
+    if not train:
+        log.info("Training skipped", extra={"symbol": symbol})
+        return
+
     # Train only if model does not exist
     if os.path.exists(model_path):
-        print(f"[INFO] Model already exists at {model_path}, skipping training.")
+        log.info("Model already exists, skipping training", extra={"symbol": symbol, "model_path": model_path})
     else:
         train_script_path = os.path.join(script_dir, "train_model.py")
         if not os.path.exists(train_script_path):
-            print(f"[ERROR] Training script not found: {train_script_path}")
+            log.error("Training script not found", extra={"script": train_script_path})
         else:
             cmd = [sys.executable, train_script_path, symbol, stock_dir]
-            print(f"  [RUNNING] train_model.py")
+            log.info("Running stage", extra={"symbol": symbol, "script": "train_model.py"})
+            started = time.perf_counter()
             try:
-                subprocess.run(cmd, check=True, cwd=script_dir, capture_output=True, text=True)
-                print(f"  [OK] train_model.py completed")
+                with stage("pipeline_train_model"):
+                    subprocess.run(cmd, check=True, cwd=script_dir, capture_output=True, text=True)
+                log.info("Stage completed", extra={"symbol": symbol, "script": "train_model.py",
+                                                    "seconds": round(time.perf_counter() - started, 3)})
             except subprocess.CalledProcessError as e:
-                print(f"  [ERROR] train_model.py failed: {e}")
-                print(f"  Error output: {e.stderr}")
+                log.error("Stage failed", extra={"symbol": symbol, "script": "train_model.py", "error": str(e), "stderr": e.stderr})
                 raise
 
+def run_pipeline(symbol, stock_dir=None, train=True, predict=True):
+    symbol = symbol.upper()
+    
+    # Get the directory where this script is located
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # If stock_dir is not provided, use default relative path
+    if stock_dir is None:
+        stock_dir = os.path.join(script_dir, "stocks_data", symbol)
+    else:
+        # Ensure stock_dir is absolute
+        if not os.path.isabs(stock_dir):
+            stock_dir = os.path.abspath(stock_dir)
+    
+    os.makedirs(stock_dir, exist_ok=True)
+
+    # One run per symbol at a time; a second caller waits and reuses the artifacts
+    with pipeline_lock(symbol, stock_dir):
+        _run_stages(symbol, stock_dir, script_dir, train)
+
+    if not (train and predict):
+        return None
+
     # Predict today
     decision_today = predict_today(symbol, stock_dir)
     
     # Send only the decision to frontend
-    print(decision_today)  
+    print(decision_today)
+    return decision_today
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("symbol")
     args = parser.parse_args()
+    configure_logging()
     run_pipeline(args.symbol)
@@ -0,0 +1,163 @@
+"""
+Micro-batching inference executor.
+
+Concurrent predict calls are queued for a few milliseconds, grouped by model
+and run as one batched forward pass on a single worker thread with a fixed
+torch thread budget, instead of every request doing its own batch-1 pass.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+import torch
+
+from services.metrics import Gauge, Histogram, stage
+
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+NUM_THREADS = int(os.getenv("INFERENCE_THREADS", "2"))
+# Longest a caller waits on its prediction, queueing included (<= 0 waits forever)
+PREDICT_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+
+QUEUE_DEPTH = Gauge("sentitrade_inference_queue_depth", "Requests waiting for the inference worker")
+BATCH_SIZE = Histogram(
+    "sentitrade_inference_batch_size",
+    "Samples per batched forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class _Request:
+    __slots__ = ("key", "model", "inputs", "future", "enqueued")
+
+    def __init__(self, key, model, inputs):
+        self.key = key
+        self.model = model
+        self.inputs = inputs
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class InferenceExecutor:
+    """Queue single-sample requests and run them as batched forward passes.
+
+    Requests sharing a `key` (normally the model path) and model object are
+    stacked along a new batch axis, so every input array must have the same
+    shape within a key.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, num_threads=NUM_THREADS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_threads = num_threads
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+            "max_batch_size": 0,
+            "wait_seconds_total": 0.0,
+        }
+        self._worker = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, key, model, *inputs):
+        """Enqueue one sample and return a Future resolving to its output row."""
+        req = _Request(key, model, inputs)
+        self._queue.put(req)
+        with self._lock:
+            self._stats["requests"] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+        return req.future
+
+    def predict(self, key, model, *inputs, timeout=PREDICT_TIMEOUT_SECONDS):
+        """Blocking helper: submit one sample and wait up to `timeout` seconds for its scalar prediction."""
+        future = self.submit(key, model, *inputs)
+        try:
+            return float(future.result(timeout=timeout if timeout and timeout > 0 else None))
+        except FutureTimeout:
+            raise TimeoutError(f"Inference for {key} did not finish within {timeout}s") from None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["max_batch"] = self.max_batch
+        stats["max_wait_ms"] = self.max_wait * 1000.0
+        stats["num_threads"] = self.num_threads
+        return stats
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        torch.set_num_threads(self.num_threads)
+        while True:
+            batch = self._collect()
+            groups = {}
+            for req in batch:
+                # A reloaded model can share its path with requests still holding the old one
+                groups.setdefault((req.key, id(req.model)), []).append(req)
+            for reqs in groups.values():
+                for start in range(0, len(reqs), self.max_batch):
+                    self._run_group(reqs[start:start + self.max_batch])
+
+    def _run_group(self, reqs):
+        started = time.perf_counter()
+        model = reqs[0].model
+        try:
+            device = next(model.parameters()).device
+            tensors = [
+                torch.from_numpy(np.stack([r.inputs[i] for r in reqs])).to(device)
+                for i in range(len(reqs[0].inputs))
+            ]
+            with stage("forward_pass"), torch.no_grad():
+                out = model(*tensors).cpu().numpy()
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += len(reqs)
+            for r in reqs:
+                r.future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(reqs))
+            self._stats["wait_seconds_total"] += sum(started - r.enqueued for r in reqs)
+        BATCH_SIZE.observe(len(reqs))
+        for r, value in zip(reqs, out):
+            r.future.set_result(value)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide executor, starting its worker on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor()
+                QUEUE_DEPTH.set_function(_executor._queue.qsize)
+    return _executor
@@ -0,0 +1,86 @@
+"""
+Data file helpers: atomic file replacement, per-symbol pipeline locks and
+tail reads of CSV files.
+"""
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+from filelock import FileLock
+
+LOCK_TIMEOUT = float(os.getenv("PIPELINE_LOCK_TIMEOUT", "1800"))
+TAIL_BLOCK_SIZE = 64 * 1024
+
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yield a temp path next to `path`; on success it is renamed over `path`,
+    so readers only ever see the old file or the complete new one. The
+    extension is kept so np.savez/joblib see the same suffix.
+    """
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.tmp-{os.getpid()}-{threading.get_ident()}{ext}"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@contextmanager
+def pipeline_lock(symbol, stock_dir):
+    """
+    Exclusive per-symbol lock across threads and processes (uvicorn workers).
+    Re-entrant within a thread, so run_pipeline can be called while held.
+    """
+    os.makedirs(stock_dir, exist_ok=True)
+    lock_path = os.path.join(os.path.abspath(stock_dir), f".{symbol}.lock")
+    with _LOCKS_GUARD:
+        if lock_path not in _LOCKS:
+            _LOCKS[lock_path] = (threading.RLock(), FileLock(lock_path, timeout=LOCK_TIMEOUT))
+        thread_lock, file_lock = _LOCKS[lock_path]
+    with thread_lock, file_lock:
+        yield
+
+
+def read_csv_tail(path, rows, columns=None, index_col="Date"):
+    """
+    Last `rows` data rows of a CSV as a DataFrame, with only `columns` (plus
+    the date index) parsed. Reads backwards from the end of the file in
+    blocks, so the cost depends on `rows`, not on how long the history is.
+    """
+    import pandas as pd
+
+    if rows <= 0:
+        # A [-0:] slice would return the whole file
+        raise ValueError(f"rows must be positive, got {rows}")
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        pos = f.seek(0, os.SEEK_END)
+        chunk = b""
+        # rows + 1 newlines guarantee `rows` whole lines after the partial first one
+        while pos > data_start and chunk.count(b"\n") <= rows:
+            step = min(TAIL_BLOCK_SIZE, pos - data_start)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + chunk
+
+    lines = chunk.splitlines()
+    if pos > data_start:
+        lines = lines[1:]
+    lines = [line for line in lines if line.strip()][-rows:]
+    usecols = None if columns is None else list(dict.fromkeys([index_col, *columns]))
+    return pd.read_csv(
+        io.BytesIO(header + b"\n".join(lines) + b"\n"),
+        usecols=usecols,
+        parse_dates=[index_col],
+        index_col=index_col,
+    )
@@ -0,0 +1,120 @@
+"""
+Bounded background job queue for cold-symbol pipeline runs.
+
+A fixed pool of workers runs jobs; once `max_pending` jobs are queued or
+running, new submissions are shed with QueueFull so HTTP handlers can answer
+503 instead of piling up work. Jobs with the same key (symbol) are
+deduplicated while one is in flight.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import Counter, Gauge
+
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+PIPELINE_MAX_QUEUE = int(os.getenv("PIPELINE_MAX_QUEUE", "16"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+JOBS_PENDING = Gauge("sentitrade_pipeline_jobs_pending", "Pipeline jobs queued or running")
+JOBS_SHED = Counter("sentitrade_pipeline_jobs_shed_total", "Pipeline jobs rejected because the queue was full")
+JOBS_FINISHED = Counter("sentitrade_pipeline_jobs_finished_total", "Pipeline jobs finished, by status", ["status"])
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, workers=PIPELINE_WORKERS, max_pending=PIPELINE_MAX_QUEUE, ttl=JOB_TTL_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}   # key -> job id while queued or running
+        self._shed = 0
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return its job record (an existing one if key is in flight)."""
+        with self._lock:
+            self._prune()
+            if key in self._active:
+                return self._view(self._jobs[self._active[key]])
+            if len(self._active) >= self.max_pending:
+                self._shed += 1
+                JOBS_SHED.inc()
+                raise QueueFull(f"{len(self._active)} pipeline jobs pending (limit {self.max_pending})")
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "key": key,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+            }
+            self._jobs[job["job_id"]] = job
+            self._active[key] = job["job_id"]
+            view = self._view(job)
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return view
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._view(job) if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j["status"] == "running")
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": len(self._active),
+                "running": running,
+                "queued": len(self._active) - running,
+                "shed": self._shed,
+            }
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            job["status"] = "running"
+            job["started"] = time.time()
+        try:
+            result, error, status = fn(*args, **kwargs), None, "done"
+        except Exception as e:
+            result, error, status = None, str(e), "failed"
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished=time.time())
+            self._active.pop(job["key"], None)
+        JOBS_FINISHED.labels(status=status).inc()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [jid for jid, j in self._jobs.items() if j["finished"] is not None and j["finished"] < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+
+    @staticmethod
+    def _view(job):
+        return {k: v for k, v in job.items() if k != "key"}
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide pipeline job queue."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+                JOBS_PENDING.set_function(lambda: len(_queue._active))
+    return _queue
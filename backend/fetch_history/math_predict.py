@@ -1,8 +1,15 @@
 import os
 import argparse
 import subprocess
-import pandas as pd
 import sys
+try:
+    from .columns import CONSUMER_COLS
+    from .io_utils import read_csv_tail
+except ImportError:
+    from columns import CONSUMER_COLS
+    from io_utils import read_csv_tail
+
+DATA_ROOT = os.getenv("STOCK_DATA_DIR", os.path.join(os.path.dirname(__file__), "stocks_data"))
 
 # ---------- CONFIGURABLE THRESHOLDS ----------
 RET_1D_BUY = 0.01       # 1% gain in 1 day → bullish
@@ -14,6 +21,9 @@ TREND_50_SELL = 0.98    # Price < 2% below 50-day SMA → bearish
 MACD_BUY = 0             # MACD positive → upward momentum
 MACD_SELL = 0            # MACD negative → downward momentum
 
+# Columns simple_decision reads
+MATH_COLS = CONSUMER_COLS["math"]
+
 # ---------- HEURISTIC FUNCTION ----------
 def simple_decision(row):
     """Return BUY/SELL/HOLD based on thresholds."""
@@ -25,7 +35,7 @@ def simple_decision(row):
         return "HOLD"
 
 def ensure_features(symbol):
-    stock_dir = os.path.join(os.path.dirname(__file__), "stocks_data", symbol.upper())
+    stock_dir = os.path.join(DATA_ROOT, symbol.upper())
     features_file = os.path.join(stock_dir, f"{symbol.upper()}_features_reg.csv")
     if not os.path.exists(features_file):
         print(f"[INFO] Features file not found. Running features.py and fetch_data.py for {symbol}...")
@@ -38,7 +48,7 @@ def ensure_features(symbol):
     return features_file
 
 def predict_last_date(symbol):
-    stock_dir = os.path.join(os.path.dirname(__file__), "stocks_data", symbol.upper())
+    stock_dir = os.path.join(DATA_ROOT, symbol.upper())
     features_file = os.path.join(stock_dir, f"{symbol.upper()}_features_reg.csv")
     print(f"[DEBUG] Checking for features file at: {os.path.abspath(features_file)} (symbol={symbol})")
 
@@ -46,11 +56,8 @@ def predict_last_date(symbol):
         print(f"[ERROR] Features file not found: {features_file}")
         return
 
-    # Load CSV
-    df = pd.read_csv(features_file, parse_dates=["Date"], index_col="Date")
-
-    # Take last row
-    last_row = df.iloc[-1]
+    # Load only the last row
+    last_row = read_csv_tail(features_file, 1, MATH_COLS).iloc[-1]
 
     # Make decision
     decision = simple_decision(last_row)
@@ -0,0 +1,128 @@
+"""
+Panel feature builder: loads many symbols into aligned (date x symbol)
+frames and computes every indicator column-wise in one pass, then writes
+per-symbol *_features_reg.csv files in the same schema as features.py.
+
+Usage: python panel_features.py AAPL MSFT GOOG ... [--data-root stocks_data] [--check]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .features import PERSISTED_COLS, dropna_cols, indicators, build_features
+    from .io_utils import atomic_path
+except ImportError:
+    from features import PERSISTED_COLS, dropna_cols, indicators, build_features
+    from io_utils import atomic_path
+
+DEFAULT_DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stocks_data")
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def load_ohlcv(symbol, data_root):
+    return pd.read_csv(
+        os.path.join(data_root, symbol, f"{symbol}_data.csv"),
+        parse_dates=["Date"],
+        index_col="Date"
+    ).astype(float)
+
+
+def load_panel(symbols, data_root):
+    """Return ({field: date x symbol DataFrame}, {symbol: OHLCV frame}) on the union of dates."""
+    frames = {}
+    for symbol in symbols:
+        try:
+            frames[symbol] = load_ohlcv(symbol, data_root)
+        except FileNotFoundError:
+            print(f"[WARNING] No price data for {symbol}, skipping")
+    if not frames:
+        return {}, {}
+    panel = {
+        field: pd.concat({s: df[field] for s, df in frames.items()}, axis=1).sort_index()
+        for field in OHLCV
+    }
+    return panel, frames
+
+
+def _has_gaps(close):
+    """True if the column has missing bars after its first observation."""
+    first = close.first_valid_index()
+    return first is not None and close.loc[first:].isna().any()
+
+
+def build_panel_features(symbols, data_root=DEFAULT_DATA_ROOT, columns=PERSISTED_COLS):
+    """Return {symbol: features frame} for all symbols, computed in one vectorized pass.
+
+    Rolling windows count rows, so a symbol with missing bars inside the shared
+    calendar would not match its single-symbol output; those fall back to
+    features.build_features on their own rows.
+    """
+    symbols = [s.upper() for s in symbols]
+    panel, frames = load_panel(symbols, data_root)
+    if not frames:
+        return {}
+
+    gapped = [s for s in frames if _has_gaps(panel["Close"][s])]
+    aligned = [s for s in frames if s not in gapped]
+
+    results = {}
+    if aligned:
+        cols = {field: panel[field][aligned] for field in OHLCV}
+        computed = indicators(cols["Close"], cols["High"], cols["Low"], cols["Volume"], columns)
+        for symbol in aligned:
+            rows = frames[symbol].index
+            df = pd.DataFrame({field: cols[field][symbol] for field in OHLCV}).loc[rows]
+            for name, values in computed.items():
+                df[name] = values[symbol].loc[rows]
+            df.dropna(subset=dropna_cols(columns), inplace=True)
+            results[symbol] = df
+
+    for symbol in gapped:
+        print(f"[INFO] {symbol} has missing bars in the shared calendar, using single-symbol path")
+        results[symbol] = build_features(frames[symbol], columns)
+    return results
+
+
+def write_panel_features(results, data_root=DEFAULT_DATA_ROOT):
+    for symbol, df in results.items():
+        path = os.path.join(data_root, symbol, f"{symbol}_features_reg.csv")
+        with atomic_path(path) as tmp:
+            df.to_csv(tmp)
+    print(f"[OK] Regression features saved for {len(results)} symbols under {data_root}")
+
+
+def check_equivalence(results, data_root=DEFAULT_DATA_ROOT, rtol=1e-9, atol=1e-12):
+    """Compare panel output against features.build_features per symbol; return mismatching symbols."""
+    mismatches = []
+    for symbol, panel_df in results.items():
+        single_df = build_features(load_ohlcv(symbol, data_root))
+        same = (
+            panel_df.index.equals(single_df.index)
+            and list(panel_df.columns) == list(single_df.columns)
+            and np.allclose(panel_df.to_numpy(), single_df.to_numpy(), rtol=rtol, atol=atol, equal_nan=True)
+        )
+        if not same:
+            mismatches.append(symbol)
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--data-root", default=DEFAULT_DATA_ROOT)
+    parser.add_argument("--check", action="store_true",
+                        help="verify against the single-symbol path instead of writing files")
+    args = parser.parse_args()
+
+    results = build_panel_features(args.symbols, args.data_root)
+    if args.check:
+        mismatches = check_equivalence(results, args.data_root)
+        if mismatches:
+            print(f"[ERROR] Panel features differ from single-symbol path for: {', '.join(mismatches)}")
+            raise SystemExit(1)
+        print(f"[OK] Panel features match single-symbol path for {len(results)} symbols")
+    else:
+        write_panel_features(results, args.data_root)
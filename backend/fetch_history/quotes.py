@@ -0,0 +1,359 @@
+"""
+Live quote streaming with one upstream poll loop per watched symbol.
+
+A QuoteHub keeps a Channel per symbol that has subscribers. Each channel polls
+the quote feed on its own, keeps a ring buffer of the most recent closed bars
+and updates incremental indicators as each bar arrives. It then fans the bar
+out to every subscriber's queue, so N viewers of a symbol cost one upstream
+poll per interval instead of N. A channel stops polling once it has had no
+subscribers for QUOTE_IDLE_SECONDS.
+
+Feeds are blocking objects with `fetch(symbol, since)` returning closed bars
+newer than `since` (all recent bars when since is None), oldest first:
+- YahooQuoteFeed: 1-minute bars via yfinance
+- FakeQuoteFeed: deterministic random walk for local runs (QUOTE_FEED=fake)
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import re
+import time
+import zlib
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from services.metrics import Gauge, upstream
+
+QUOTE_FEED = os.getenv("QUOTE_FEED", "yahoo")
+QUOTE_POLL_SECONDS = float(os.getenv("QUOTE_POLL_SECONDS", "15"))
+QUOTE_BUFFER_BARS = int(os.getenv("QUOTE_BUFFER_BARS", "390"))  # one regular session of 1m bars
+QUOTE_IDLE_SECONDS = float(os.getenv("QUOTE_IDLE_SECONDS", "30"))
+SUBSCRIBER_QUEUE_SIZE = 256
+# Tickers as Yahoo spells them: BRK-B, RDS.A, ^GSPC, EURUSD=X
+SYMBOL_PATTERN = re.compile(r"\^?[A-Z0-9][A-Z0-9.\-]{0,14}(=X|=F)?")
+
+ACTIVE_SYMBOLS = Gauge("sentitrade_quote_symbols_active", "Symbols with a running quote poll loop")
+SUBSCRIBERS = Gauge("sentitrade_quote_subscribers", "Connected quote stream subscribers")
+
+
+# ---------- feeds ----------
+class YahooQuoteFeed:
+    interval = "1m"
+
+    def fetch(self, symbol, since=None):
+        import yfinance as yf
+        with upstream("yahoo_quotes"):
+            # First fetch backfills a few sessions so the 50-bar indicators are warm
+            df = yf.Ticker(symbol).history(period="1d" if since else "5d", interval=self.interval)
+        # The last row is the bar still being built; only closed bars are emitted
+        bars = []
+        for ts, row in df.iloc[:-1].iterrows():
+            ts = ts.timestamp()
+            if since is None or ts > since:
+                bars.append({
+                    "ts": ts,
+                    "open": float(row["Open"]),
+                    "high": float(row["High"]),
+                    "low": float(row["Low"]),
+                    "close": float(row["Close"]),
+                    "volume": float(row["Volume"]),
+                })
+        return bars
+
+
+class FakeQuoteFeed:
+    """Seeded random-walk bars; each fetch closes exactly one new bar."""
+
+    def __init__(self, history=100, bar_seconds=60):
+        self.history = history
+        self.bar_seconds = bar_seconds
+        self.fetches = {}
+        self._state = {}
+
+    def _next_bar(self, symbol):
+        rng, ts, close = self._state[symbol]
+        open_ = close
+        close = max(1.0, open_ * (1 + rng.gauss(0, 0.002)))
+        bar = {
+            "ts": ts,
+            "open": open_,
+            "high": max(open_, close) * (1 + abs(rng.gauss(0, 0.001))),
+            "low": min(open_, close) * (1 - abs(rng.gauss(0, 0.001))),
+            "close": close,
+            "volume": float(rng.randint(1_000, 50_000)),
+        }
+        self._state[symbol] = (rng, ts + self.bar_seconds, close)
+        return bar
+
+    def fetch(self, symbol, since=None):
+        self.fetches[symbol] = self.fetches.get(symbol, 0) + 1
+        if symbol not in self._state:
+            seed = zlib.crc32(symbol.encode())
+            start = time.time() // self.bar_seconds * self.bar_seconds - self.history * self.bar_seconds
+            self._state[symbol] = (random.Random(seed), start, 50.0 + seed % 400)
+        count = self.history if since is None else 1
+        return [b for b in (self._next_bar(symbol) for _ in range(count)) if since is None or b["ts"] > since]
+
+
+def make_feed(name=QUOTE_FEED):
+    if name == "fake":
+        return FakeQuoteFeed()
+    if name == "yahoo":
+        return YahooQuoteFeed()
+    raise ValueError(f"Unknown QUOTE_FEED {name!r} (expected 'yahoo' or 'fake')")
+
+
+# ---------- incremental indicators ----------
+class _RollingMean:
+    """Mean of the last `window` values, NaN until the window is full."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def push(self, value):
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        return self.total / self.window if len(self.values) == self.window else math.nan
+
+
+class _EWMean:
+    """pandas ewm(span=...).mean() (adjust=True), one value at a time."""
+
+    def __init__(self, span):
+        self.decay = 1 - 2 / (span + 1)
+        self.num = 0.0
+        self.den = 0.0
+
+    def push(self, value):
+        self.num = value + self.decay * self.num
+        self.den = 1 + self.decay * self.den
+        return self.num / self.den
+
+
+class IncrementalIndicators:
+    """
+    Streaming counterpart of features.indicators: the same feature columns,
+    updated in O(1) per bar instead of recomputed over the whole history.
+    """
+
+    def __init__(self):
+        self.closes = deque(maxlen=5)  # previous closes, for ret_1d and ret_5d
+        self.prev_volume = None
+        self.sma = {n: _RollingMean(n) for n in (10, 20, 50)}
+        self.gain = _RollingMean(14)
+        self.loss = _RollingMean(14)
+        self.ema12 = _EWMean(12)
+        self.ema26 = _EWMean(26)
+        self.atr = _RollingMean(14)
+        self.vol_mean = _RollingMean(20)
+
+    def update(self, bar):
+        close, high, low, volume = bar["close"], bar["high"], bar["low"], bar["volume"]
+        prev = self.closes[-1] if self.closes else None
+        out = {}
+
+        out["ret_1d"] = close / prev - 1 if prev else math.nan
+        out["ret_5d"] = close / self.closes[0] - 1 if len(self.closes) == 5 else math.nan
+        for n, sma in self.sma.items():
+            out[f"sma_{n}"] = sma.push(close)
+        out["trend_50"] = close / out["sma_50"]
+
+        if prev is None:
+            out["RSI"] = math.nan
+        else:
+            gain = self.gain.push(max(close - prev, 0.0))
+            loss = self.loss.push(max(prev - close, 0.0))
+            if loss > 0:
+                out["RSI"] = 100 - 100 / (1 + gain / loss)
+            else:
+                out["RSI"] = 100.0 if gain > 0 else math.nan
+
+        out["MACD"] = self.ema12.push(close) - self.ema26.push(close)
+
+        tr = high - low
+        if prev is not None:
+            tr = max(tr, abs(high - prev), abs(low - prev))
+        out["ATR"] = self.atr.push(tr)
+        out["ATR_pct"] = out["ATR"] / close
+
+        out["vol_chg"] = volume / self.prev_volume - 1 if self.prev_volume else math.nan
+        out["vol_norm"] = volume / self.vol_mean.push(volume)
+
+        self.closes.append(close)
+        self.prev_volume = volume
+        return out
+
+
+# ---------- fan-out ----------
+def _clean(value):
+    # JSON has no NaN; indicators that are still warming up go out as null
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+class Channel:
+    """Poll loop, ring buffer, indicator state and subscribers for one symbol."""
+
+    def __init__(self, symbol, buffer_bars):
+        self.symbol = symbol
+        self.bars = deque(maxlen=buffer_bars)
+        self.indicators = IncrementalIndicators()
+        self.subscribers = set()
+        self.last_ts = None
+        self.idle_since = time.monotonic()
+        self.task = None
+        self.polls = 0
+        self.errors = 0
+
+    def add_bar(self, bar):
+        event = {"symbol": self.symbol, **bar}
+        event["time"] = datetime.fromtimestamp(bar["ts"], timezone.utc).isoformat()
+        for name, value in self.indicators.update(bar).items():
+            event[name] = _clean(value)
+        self.bars.append(event)
+        self.last_ts = bar["ts"]
+        for queue in self.subscribers:
+            if queue.full():
+                # A stalled client loses its oldest bars rather than growing without bound
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+def check_symbol(symbol):
+    """Uppercased symbol, or ValueError if it cannot be a ticker."""
+    symbol = symbol.strip().upper()
+    if not SYMBOL_PATTERN.fullmatch(symbol):
+        raise ValueError(f"Invalid symbol {symbol!r}")
+    return symbol
+
+
+class QuoteHub:
+    def __init__(self, feed=None, poll_seconds=QUOTE_POLL_SECONDS, buffer_bars=QUOTE_BUFFER_BARS,
+                 idle_seconds=QUOTE_IDLE_SECONDS):
+        self.feed = feed if feed is not None else make_feed()
+        self.poll_seconds = poll_seconds
+        self.buffer_bars = buffer_bars
+        self.idle_seconds = idle_seconds
+        self.channels = {}
+
+    async def open(self, symbol):
+        """
+        Validate symbol and make sure it has a channel, fetching its first bars
+        if it is not being watched yet. Raises ValueError for a malformed symbol
+        and LookupError when the feed has no bars for it, so unknown tickers
+        never get a poll loop. Call before subscribe().
+        """
+        symbol = check_symbol(symbol)
+        if symbol in self.channels:
+            return symbol
+        bars = await asyncio.to_thread(self.feed.fetch, symbol, None)
+        if not bars:
+            raise LookupError(f"No quotes for {symbol}")
+        if symbol not in self.channels:
+            channel = self.channels[symbol] = Channel(symbol, self.buffer_bars)
+            channel.polls += 1
+            for bar in bars:
+                channel.add_bar(bar)
+            # Polls (and expires after idle_seconds) even if the caller never subscribes
+            channel.task = asyncio.create_task(self._poll(channel))
+        return symbol
+
+    @asynccontextmanager
+    async def subscribe(self, symbol):
+        """
+        Yield (backfill, queue): the buffered recent bars, then a queue that
+        receives every new bar for the symbol until the context exits.
+        """
+        symbol = symbol.upper()
+        channel = self.channels.get(symbol)
+        if channel is None:
+            channel = self.channels[symbol] = Channel(symbol, self.buffer_bars)
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        channel.subscribers.add(queue)
+        if channel.task is None or channel.task.done():
+            channel.task = asyncio.create_task(self._poll(channel))
+        try:
+            yield list(channel.bars), queue
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers:
+                channel.idle_since = time.monotonic()
+
+    async def _poll(self, channel):
+        try:
+            while True:
+                if not channel.subscribers and time.monotonic() - channel.idle_since >= self.idle_seconds:
+                    break
+                channel.polls += 1
+                try:
+                    bars = await asyncio.to_thread(self.feed.fetch, channel.symbol, channel.last_ts)
+                except Exception:
+                    # Keep the loop alive through upstream hiccups; the next poll retries
+                    channel.errors += 1
+                    bars = []
+                for bar in bars:
+                    channel.add_bar(bar)
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            # Nobody watching: forget the symbol so its state and poll loop go away
+            if self.channels.get(channel.symbol) is channel and not channel.subscribers:
+                del self.channels[channel.symbol]
+
+    def stats(self):
+        return {
+            symbol: {
+                "subscribers": len(c.subscribers),
+                "buffered_bars": len(c.bars),
+                "polls": c.polls,
+                "errors": c.errors,
+                "last_bar": c.bars[-1]["time"] if c.bars else None,
+            }
+            for symbol, c in self.channels.items()
+        }
+
+
+_hub = None
+
+
+def get_quote_hub():
+    """Return the process-wide hub (call from inside the server's event loop)."""
+    global _hub
+    if _hub is None:
+        _hub = QuoteHub()
+        ACTIVE_SYMBOLS.set_function(lambda: len(_hub.channels))
+        SUBSCRIBERS.set_function(lambda: sum(len(c.subscribers) for c in _hub.channels.values()))
+    return _hub
+
+
+async def _demo(symbols, subscribers, bars):
+    feed = FakeQuoteFeed()
+    hub = QuoteHub(feed, poll_seconds=0.05, idle_seconds=0)
+
+    async def watch(symbol, n):
+        async with hub.subscribe(symbol) as (backfill, queue):
+            # Early subscribers get the initial history through the queue, later ones as backfill
+            for _ in range(feed.history + n - len(backfill)):
+                event = await queue.get()
+            return symbol, len(backfill), event
+
+    results = await asyncio.gather(*(watch(s, bars) for s in symbols for _ in range(subscribers)))
+    for symbol, backfill, event in results[::subscribers]:
+        print(f"[INFO] {symbol}: backfill={backfill} close={event['close']:.2f} RSI={event['RSI']}")
+    await asyncio.sleep(0.2)
+    print(f"[OK] upstream fetches per symbol with {subscribers} subscribers each: {feed.fetches}")
+    print(f"[OK] channels left after everyone disconnected: {list(hub.channels)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the quote hub against the fake feed")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--subscribers", type=int, default=5)
+    parser.add_argument("--bars", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(_demo([s.upper() for s in args.symbols], args.subscribers, args.bars))
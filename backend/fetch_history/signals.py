@@ -0,0 +1,232 @@
+"""
+Nightly precomputed signal table.
+
+The batch job refreshes prices and features for the configured universe,
+runs the math_predict heuristic and GRU inference for every symbol, and
+writes one row per symbol to signals.csv under the data root. The API reads
+that table into memory and answers from it; the inputs only change once
+per daily bar.
+
+Run after the close, e.g. from cron (from backend/):
+    30 22 * * 1-5  python -m fetch_history.signals
+or keep a process around with --at 22:30.
+"""
+import argparse
+import csv
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+DEFAULT_DATA_ROOT = os.getenv("STOCK_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "stocks_data"))
+SIGNALS_FILE = "signals.csv"
+SIGNAL_UNIVERSE = [s.strip().upper() for s in os.getenv("SIGNAL_UNIVERSE", "").split(",") if s.strip()]
+SIGNAL_RELOAD_SECONDS = float(os.getenv("SIGNAL_RELOAD_SECONDS", "60"))
+# Rows older than this are ignored, so a stalled nightly job falls back to live computation
+SIGNAL_MAX_AGE_HOURS = float(os.getenv("SIGNAL_MAX_AGE_HOURS", "36"))
+COLUMNS = [
+    "symbol", "as_of", "math_decision", "gru_decision",
+    "predicted_return", "atr_threshold", "model_kind", "generated_at",
+]
+
+
+def signals_path(data_root=DEFAULT_DATA_ROOT):
+    return os.path.join(data_root, SIGNALS_FILE)
+
+
+def build_signals(symbols, data_root=DEFAULT_DATA_ROOT, model_kind=None, train_missing=False, refresh=True):
+    """Refresh data/features for `symbols`, score them and write the signals table."""
+    # Batch-only dependencies; the API process only needs SignalTable
+    from .history_pipeline import artifacts_ready, predict_details
+    from .io_utils import atomic_path, pipeline_lock, read_csv_tail
+    from .math_predict import MATH_COLS, simple_decision
+    from .panel_features import build_panel_features, write_panel_features
+
+    symbols = [s.upper() for s in symbols]
+    if refresh:
+        from . import fetch_data
+        fetched = []
+        for symbol in symbols:
+            stock_dir = os.path.join(data_root, symbol)
+            os.makedirs(stock_dir, exist_ok=True)
+            # One bad ticker must not abort the universe; its row is left out so the API computes it live
+            try:
+                with pipeline_lock(symbol, stock_dir):
+                    fetch_data.main(symbol, stock_dir)
+            except Exception as e:
+                print(f"[ERROR] Fetching {symbol} failed, leaving it out of the table: {e}")
+                continue
+            fetched.append(symbol)
+        symbols = fetched
+        # One vectorized feature pass over the whole universe
+        write_panel_features(build_panel_features(symbols, data_root), data_root)
+
+    rows = {}
+    for symbol in symbols:
+        features_file = os.path.join(data_root, symbol, f"{symbol}_features_reg.csv")
+        if not os.path.exists(features_file):
+            print(f"[WARNING] No features for {symbol}, skipping")
+            continue
+        last = read_csv_tail(features_file, 1, MATH_COLS).iloc[-1]
+        rows[symbol] = {
+            "symbol": symbol,
+            "as_of": last.name.strftime("%Y-%m-%d"),
+            "math_decision": simple_decision(last),
+            "gru_decision": "",
+            "predicted_return": "",
+            "atr_threshold": "",
+            "model_kind": "",
+        }
+
+    # Concurrent predict_details calls are grouped into batched forward passes
+    # by the inference executor (one batch for the whole universe with the global model)
+    scored = [
+        s for s in rows
+        if train_missing or artifacts_ready(s, os.path.join(data_root, s), model_kind)
+    ]
+    for s in rows:
+        if s not in scored:
+            print(f"[WARNING] No trained model for {s}, GRU signal left empty")
+
+    def score(symbol):
+        try:
+            return symbol, predict_details(symbol, os.path.join(data_root, symbol), model_kind)
+        except Exception as e:
+            print(f"[ERROR] GRU inference failed for {symbol}: {e}")
+            return symbol, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(64, len(scored)))) as pool:
+        for symbol, details in pool.map(score, scored):
+            if details is None:
+                continue
+            rows[symbol].update(
+                gru_decision=details["decision"],
+                predicted_return=details["predicted_return"],
+                atr_threshold=details["atr_threshold"],
+                model_kind=details["model_kind"],
+            )
+
+    # Full precision: the features written moments ago must not look newer than the table
+    generated_at = datetime.now().isoformat()
+    os.makedirs(data_root, exist_ok=True)
+    with atomic_path(signals_path(data_root)) as tmp:
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for row in rows.values():
+                writer.writerow({**row, "generated_at": generated_at})
+    print(f"[OK] Signals saved for {len(rows)} symbols: {signals_path(data_root)}")
+    return rows
+
+
+class SignalTable:
+    """In-memory view of signals.csv, reloaded when the file changes."""
+
+    def __init__(self, path=None, reload_seconds=SIGNAL_RELOAD_SECONDS, max_age_hours=SIGNAL_MAX_AGE_HOURS):
+        self.path = path or signals_path()
+        self.data_root = os.path.dirname(self.path)
+        self.reload_seconds = reload_seconds
+        self.max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._mtime = None
+        self._checked = 0.0
+
+    def get(self, symbol):
+        """Row for symbol, or None if the table has no current entry for it."""
+        now = time.monotonic()
+        if now - self._checked >= self.reload_seconds:
+            self._maybe_reload(now)
+        row = self._rows.get(symbol)
+        if row is None or self._stale(row):
+            return None
+        return row
+
+    def _stale(self, row):
+        """True if the row is too old or the symbol's features/model were rebuilt after it was generated."""
+        generated = row["generated_ts"]
+        if generated is None or time.time() - generated > self.max_age_seconds:
+            return True
+        symbol = row["symbol"]
+        inputs = [
+            os.path.join(self.data_root, symbol, f"{symbol}_features_reg.csv"),
+            os.path.join(self.data_root, symbol, f"{symbol}_reg_model.pth"),
+            os.path.join(self.data_root, "global_reg_model.pth") if row["model_kind"] == "global" else None,
+        ]
+        for path in filter(None, inputs):
+            try:
+                if os.path.getmtime(path) > generated:
+                    return True
+            except OSError:
+                pass
+        return False
+
+    def _maybe_reload(self, now):
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                self._rows, self._mtime = {}, None
+                return
+            if mtime == self._mtime:
+                return
+            rows = {}
+            with open(self.path, newline="") as f:
+                for row in csv.DictReader(f):
+                    for key in ("predicted_return", "atr_threshold"):
+                        row[key] = float(row[key]) if row[key] else None
+                    try:
+                        row["generated_ts"] = datetime.fromisoformat(row["generated_at"]).timestamp()
+                    except (TypeError, ValueError):
+                        row["generated_ts"] = None
+                    rows[row["symbol"]] = row
+            self._rows, self._mtime = rows, mtime
+
+
+_table = None
+
+
+def get_signal_table():
+    global _table
+    if _table is None:
+        _table = SignalTable()
+    return _table
+
+
+def _seconds_until(hhmm):
+    now = datetime.now()
+    hour, minute = (int(v) for v in hhmm.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("symbols", nargs="*", help="defaults to the SIGNAL_UNIVERSE env var")
+    parser.add_argument("--data-root", default=DEFAULT_DATA_ROOT)
+    parser.add_argument("--model", choices=["symbol", "global"], default=None)
+    parser.add_argument("--train-missing", action="store_true",
+                        help="run the full pipeline for symbols without a trained model")
+    parser.add_argument("--no-refresh", action="store_true", help="skip fetching data and rebuilding features")
+    parser.add_argument("--at", help="stay running and rebuild daily at HH:MM local time")
+    args = parser.parse_args()
+
+    universe = [s.upper() for s in args.symbols] or SIGNAL_UNIVERSE
+    if not universe:
+        parser.error("no symbols given and SIGNAL_UNIVERSE is empty")
+
+    if not args.at:
+        build_signals(universe, args.data_root, args.model, args.train_missing, not args.no_refresh)
+    while args.at:
+        time.sleep(_seconds_until(args.at))
+        # A failed run must not kill the scheduler; the next day's run retries
+        try:
+            build_signals(universe, args.data_root, args.model, args.train_missing, not args.no_refresh)
+        except Exception:
+            print("[ERROR] Signal build failed, retrying at the next scheduled run")
+            traceback.print_exc()
@@ -0,0 +1,213 @@
+"""
+Threshold / hyperparameter sweep for the GRU decision rule and the
+math_predict heuristic.
+
+Model predictions are computed once per symbol and cached next to the model
+({symbol}_preds.npz, invalidated when the model or features file changes).
+Each grid is then scored for all parameter combinations at once with
+broadcast NumPy ops, one symbol per worker process.
+
+Usage (from backend/):
+    python -m fetch_history.sweep AAPL MSFT GOOG --thresh-mult 0.2,0.3,0.4,0.5 \\
+        --grid RSI_OVERBOUGHT=70,75,80 --grid TREND_50_BUY=1.01,1.02,1.03 --out sweep.csv
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from . import math_predict
+from .history_pipeline import load_model, batched_forward
+from .io_utils import atomic_path
+from .train_model import FEATURES, SEQ_LEN, THRESH_MULT, make_windows
+
+DEFAULT_DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stocks_data")
+MATH_PARAMS = ["RET_1D_BUY", "RET_1D_SELL", "RSI_OVERBOUGHT", "TREND_50_BUY", "TREND_50_SELL", "MACD_BUY", "MACD_SELL"]
+MATH_COLUMNS = math_predict.MATH_COLS
+DEFAULT_THRESH_MULTS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0]
+MATH_CHUNK_SIZE = 256  # math combos per broadcast: ~10 MB per (combos, rows) float array at 5000 rows
+
+
+def load_symbol_arrays(symbol, data_root):
+    """Per-row arrays for one symbol: GRU prediction, ATR_pct, 5d target and math features.
+
+    Rows without SEQ_LEN history get NaN predictions. Cached in {symbol}_preds.npz.
+    """
+    stock_dir = os.path.join(data_root, symbol)
+    model_path = os.path.join(stock_dir, f"{symbol}_reg_model.pth")
+    scaler_path = os.path.join(stock_dir, f"{symbol}_scaler.save")
+    features_file = os.path.join(stock_dir, f"{symbol}_features_reg.csv")
+    cache_path = os.path.join(stock_dir, f"{symbol}_preds.npz")
+    version = np.array([os.path.getmtime(model_path), os.path.getmtime(features_file)])
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if np.array_equal(cached["version"], version):
+            return {k: cached[k] for k in cached.files}
+
+    df = pd.read_csv(features_file, parse_dates=["Date"], index_col="Date")
+    scaler = joblib.load(scaler_path)
+    model = load_model(model_path)
+
+    preds = np.full(len(df), np.nan, dtype=np.float32)
+    if len(df) >= SEQ_LEN:
+        X = scaler.transform(df[FEATURES]).astype(np.float32)
+        preds[SEQ_LEN - 1:] = batched_forward(model, make_windows(X))
+
+    arrays = {
+        "version": version,
+        "pred": preds,
+        "atr": df["ATR_pct"].to_numpy(dtype=np.float64),
+        "target": df["target"].to_numpy(dtype=np.float64),
+    }
+    for col in MATH_COLUMNS:
+        arrays[col] = df[col].to_numpy(dtype=np.float64)
+    with atomic_path(cache_path) as tmp:
+        np.savez(tmp, **arrays)
+    return arrays
+
+
+def score_gru(arrays, mults):
+    """(log equity, trades, correct) per threshold multiplier, each of shape (len(mults),)."""
+    pred, atr, y = arrays["pred"], arrays["atr"], arrays["target"]
+    thresh = mults[:, None] * atr[None, :]
+    buy = pred[None, :] > thresh
+    sell = pred[None, :] < -thresh
+    # Same definition as test.py: the signal matches the one the realized return would give
+    correct = (buy & (y[None, :] > thresh)) | (sell & (y[None, :] < -thresh))
+    logret = np.where(buy, y[None, :], 0.0) - np.where(sell, y[None, :], 0.0)
+    return logret.sum(axis=1), (buy | sell).sum(axis=1), correct.sum(axis=1)
+
+
+def score_math(arrays, grid, chunk_size=MATH_CHUNK_SIZE):
+    """(log equity, trades, correct) per math_predict parameter combo; grid maps name -> (G,) array."""
+    # Scored chunk_size combos at a time so the (combos, rows) intermediates stay bounded
+    n_combos = len(next(iter(grid.values())))
+    parts = [
+        _score_math_chunk(arrays, {k: v[i:i + chunk_size] for k, v in grid.items()})
+        for i in range(0, n_combos, chunk_size)
+    ]
+    return tuple(np.concatenate(cols) for cols in zip(*parts))
+
+
+def _score_math_chunk(arrays, grid):
+    ret = arrays["ret_1d"][None, :]
+    rsi = arrays["RSI"][None, :]
+    trend = arrays["trend_50"][None, :]
+    macd = arrays["MACD"][None, :]
+    y = arrays["target"][None, :]
+    p = {k: v[:, None] for k, v in grid.items()}
+
+    # Mirrors math_predict.simple_decision
+    buy = (ret > p["RET_1D_BUY"]) & (rsi < p["RSI_OVERBOUGHT"]) & (trend > p["TREND_50_BUY"]) & (macd > p["MACD_BUY"])
+    sell = ~buy & ((ret < p["RET_1D_SELL"]) | (rsi > p["RSI_OVERBOUGHT"]) | (trend < p["TREND_50_SELL"]) | (macd < p["MACD_SELL"]))
+    correct = (buy & (y > 0)) | (sell & (y < 0))
+    logret = np.where(buy, y, 0.0) - np.where(sell, y, 0.0)
+    return logret.sum(axis=1), (buy | sell).sum(axis=1), correct.sum(axis=1)
+
+
+def evaluate_symbol(symbol, data_root, mults, math_grid, start_frac):
+    """Score both grids on the evaluation slice of one symbol (runs in a worker process)."""
+    try:
+        arrays = load_symbol_arrays(symbol, data_root)
+    except FileNotFoundError as e:
+        print(f"[WARNING] Skipping {symbol}: {e}")
+        return symbol, None
+
+    n = len(arrays["target"])
+    rows = np.arange(n) >= int(n * start_frac)
+    rows &= ~np.isnan(arrays["target"])
+    math_rows = rows & ~np.isnan(np.column_stack([arrays[c] for c in MATH_COLUMNS])).any(axis=1)
+    gru_rows = rows & ~np.isnan(arrays["pred"])
+
+    gru = score_gru({k: v[gru_rows] for k, v in arrays.items() if k != "version"}, mults)
+    math = score_math({k: v[math_rows] for k, v in arrays.items() if k != "version"}, math_grid)
+    return symbol, (gru, math)
+
+
+def build_math_grid(overrides):
+    """Cartesian product of MATH_PARAMS, defaulting each to its current math_predict value."""
+    values = [overrides.get(name, [getattr(math_predict, name)]) for name in MATH_PARAMS]
+    combos = np.array(list(itertools.product(*values)), dtype=np.float64).reshape(-1, len(MATH_PARAMS))
+    return {name: combos[:, i] for i, name in enumerate(MATH_PARAMS)}
+
+
+def rank_table(params, results, n_symbols):
+    """Aggregate per-symbol (log equity, trades, correct) into a ranked DataFrame."""
+    log_eq = np.stack([r[0] for r in results])
+    trades = np.stack([r[1] for r in results]).sum(axis=0)
+    correct = np.stack([r[2] for r in results]).sum(axis=0)
+    table = pd.DataFrame(params)
+    table["equity"] = np.exp(log_eq).mean(axis=0)
+    table["trades"] = trades
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["accuracy"] = np.where(trades > 0, correct / trades, np.nan)
+    table["symbols"] = n_symbols
+    return table.sort_values(["equity", "accuracy"], ascending=False).reset_index(drop=True)
+
+
+def sweep(symbols, data_root=DEFAULT_DATA_ROOT, mults=DEFAULT_THRESH_MULTS, math_overrides=None,
+          start_frac=0.8, workers=None):
+    symbols = [s.upper() for s in symbols]
+    mults = np.asarray(mults, dtype=np.float64)
+    math_grid = build_math_grid(math_overrides or {})
+
+    gru_results, math_results = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_symbol, s, data_root, mults, math_grid, start_frac) for s in symbols]
+        for future in futures:
+            symbol, scored = future.result()
+            if scored is None:
+                continue
+            gru_results.append(scored[0])
+            math_results.append(scored[1])
+
+    if not gru_results:
+        raise ValueError("No symbols could be evaluated")
+
+    gru_table = rank_table({"THRESH_MULT": mults}, gru_results, len(gru_results))
+    math_table = rank_table(math_grid, math_results, len(math_results))
+    return gru_table, math_table
+
+
+def _parse_floats(text):
+    return [float(v) for v in text.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--data-root", default=DEFAULT_DATA_ROOT)
+    parser.add_argument("--thresh-mult", type=_parse_floats, default=DEFAULT_THRESH_MULTS,
+                        help=f"comma-separated GRU threshold multipliers (current: {THRESH_MULT})")
+    parser.add_argument("--grid", action="append", default=[],
+                        help="math_predict threshold grid, e.g. RSI_OVERBOUGHT=70,75,80 (repeatable)")
+    parser.add_argument("--start-frac", type=float, default=0.8,
+                        help="evaluate rows after this fraction of history (0.8 = train_model test split)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="write both ranked tables to this CSV path")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.grid:
+        name, _, values = item.partition("=")
+        if name not in MATH_PARAMS:
+            parser.error(f"unknown math parameter {name!r}, expected one of {MATH_PARAMS}")
+        overrides[name] = _parse_floats(values)
+
+    gru_table, math_table = sweep(args.symbols, args.data_root, args.thresh_mult, overrides,
+                                  args.start_frac, args.workers)
+
+    print("\n[GRU] THRESH_MULT sweep")
+    print(gru_table.head(args.top).to_string())
+    print("\n[MATH] math_predict threshold sweep")
+    print(math_table.head(args.top).to_string())
+
+    if args.out:
+        pd.concat([gru_table.assign(model="gru"), math_table.assign(model="math")]).to_csv(args.out, index=False)
+        print(f"[OK] Sweep results saved: {args.out}")
@@ -6,6 +6,10 @@ import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 from torch.utils.data import DataLoader, TensorDataset
+try:
+    from .io_utils import atomic_path
+except ImportError:
+    from io_utils import atomic_path
 
 SEQ_LEN = 60 #60 days in the past
 THRESH_MULT = 0.4  # buy/sell threshold
@@ -177,12 +181,13 @@ def train(symbol, output_dir):
     print(f"🎯 DECISION: {decision_today}")
 
     # ---------- SAVE MODEL ----------
-    torch.save({
-        "model": model.state_dict(),
-        "scaler": scaler,
-        "features": FEATURES,
-        "seq_len": SEQ_LEN
-    }, f"{output_dir}/{symbol}_reg_model.pth")
+    with atomic_path(f"{output_dir}/{symbol}_reg_model.pth") as tmp:
+        torch.save({
+            "model": model.state_dict(),
+            "scaler": scaler,
+            "features": FEATURES,
+            "seq_len": SEQ_LEN
+        }, tmp)
     print("✅ Model saved")
 
     # ---------- DEMO: PREDICT HISTORICAL DATE ----------
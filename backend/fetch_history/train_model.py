@@ -6,9 +6,14 @@ import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 from torch.utils.data import DataLoader, TensorDataset
 import joblib
+try:
+    from .io_utils import atomic_path
+except ImportError:
+    from io_utils import atomic_path
 
 SEQ_LEN = 60 #60 days in the past
 THRESH_MULT = 0.4  # buy/sell threshold
+EPOCHS = 40
 
 FEATURES = [
     "Close", "Volume", "RSI", "MACD", "ATR_pct",
@@ -26,13 +31,21 @@ class GRURegressor(nn.Module):
         out, _ = self.gru(x)
         return self.fc(out[:, -1]).squeeze(1)
 
+# Every SEQ_LEN-row window of X as a strided view; row j covers X[j:j+SEQ_LEN]
+def make_windows(X):
+    return np.lib.stride_tricks.sliding_window_view(X, SEQ_LEN, axis=0).transpose(0, 2, 1)
+
 # Converts data into sequences
 def make_sequences(X, y):
-    xs, ys = [], []
-    for i in range(SEQ_LEN, len(X)):
-        xs.append(X[i-SEQ_LEN:i])
-        ys.append(y[i])
-    return np.array(xs), np.array(ys)
+    if len(X) <= SEQ_LEN:
+        return np.empty((0, SEQ_LEN, X.shape[1])), np.empty(0)
+    return np.ascontiguousarray(make_windows(X)[:-1]), np.asarray(y[SEQ_LEN:])
+
+# BUY/SELL/HOLD for arrays of predicted returns and ATR_pct
+def get_signals(preds, atrs, mult=THRESH_MULT):
+    preds = np.asarray(preds)
+    thresh = mult * np.asarray(atrs)
+    return np.where(preds > thresh, "BUY", np.where(preds < -thresh, "SELL", "HOLD"))
 
 # Predict for a specific historical date
 def predict_for_date(df, scaler, model, date, device):
@@ -58,7 +71,7 @@ def predict_for_date(df, scaler, model, date, device):
     print(f"{date.date()} | Predicted 5d return: {pred:.4%} | ATR threshold: {THRESH_MULT*atr:.4%} | Decision: {decision}")
 
 # Training function
-def train(symbol, output_dir):
+def train(symbol, output_dir, epochs=EPOCHS):
     df = pd.read_csv(
         f"{output_dir}/{symbol}_features_reg.csv",
         parse_dates=["Date"],
@@ -100,7 +113,7 @@ def train(symbol, output_dir):
     optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
 
     # Training loop
-    for epoch in range(40):
+    for epoch in range(epochs):
         model.train()
         losses = []
         for xb, yb in loader:
@@ -155,10 +168,13 @@ def train(symbol, output_dir):
     print(f"[DECISION] {decision_today}")
 
     # ---------- SAVE MODEL ----------
-# Save model weights only
-    torch.save(model.state_dict(), f"{output_dir}/{symbol}_reg_model.pth")
-    # Save scaler separately
-    joblib.dump(scaler, f"{output_dir}/{symbol}_scaler.save")
+    # Both files are renamed into place; the scaler goes first so a reader
+    # that sees the new model never pairs it with a missing scaler
+    with atomic_path(f"{output_dir}/{symbol}_scaler.save") as tmp:
+        joblib.dump(scaler, tmp)
+    # Save model weights only
+    with atomic_path(f"{output_dir}/{symbol}_reg_model.pth") as tmp:
+        torch.save(model.state_dict(), tmp)
     print("[OK] Model saved")
 
     # ---------- DEMO: PREDICT HISTORICAL DATE ----------
@@ -171,5 +187,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("symbol")
     parser.add_argument("output_dir", nargs="?", default=".")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="cProfile the run and write pstats to PATH (view with snakeviz or pstats)")
     args = parser.parse_args()
-    train(args.symbol, args.output_dir)
+    if args.profile:
+        import cProfile, pstats
+        prof = cProfile.Profile()
+        prof.runcall(train, args.symbol, args.output_dir)
+        prof.dump_stats(args.profile)
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(25)
+        print(f"[OK] Profile saved to {args.profile}")
+    else:
+        train(args.symbol, args.output_dir)
@@ -1,41 +1,87 @@
+from services.readiness import Readiness  # first import: marks process start for the startup budget
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware  # Added for frontend connection
+from fastapi.responses import JSONResponse
 from models.prediction import ScanRequest, GumloopResult
 from services.gumloop import trigger_gumloop_flow
+from services.log import configure_logging
+from services.metrics import instrument_app, stage, upstream
+from services.profiling import add_profiling_routes, profiled
+import logging
+import threading
 import uuid
 import uvicorn
-import yfinance as yf
-import google.generativeai as genai
 import json
 import os
 import requests
 import datetime
-from langdetect import detect
 from dotenv import load_dotenv
 
+# yfinance, google.generativeai and langdetect are slow to import and are
+# loaded on first use (or by the startup warm-up), not at import time.
+
 # ======================================================
 # 1. SETUP & CONFIGURATION
 # ======================================================
 load_dotenv()
+configure_logging()
+log = logging.getLogger("main")
+
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 AI_INVEST_TOKEN = os.getenv("AI_INVEST_TOKEN")
 EMAIL = os.getenv("EMAIL")
 
 if not GEMINI_API_KEY:
-    raise ValueError("❌ CRITICAL ERROR: GEMINI_API_KEY is missing")
+    raise ValueError("CRITICAL ERROR: GEMINI_API_KEY is missing")
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Configure Gemini and build the model on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                with stage("gemini_configure"):
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+
+                    # Robust Model Loading
+                    try:
+                        log.info("Loading Gemini model", extra={"model": "gemini-2.0-flash-lite-preview-02-05"})
+                        _model = genai.GenerativeModel("gemini-2.0-flash-lite-preview-02-05")
+                    except Exception:
+                        log.warning("Falling back to Gemini model", extra={"model": "gemini-2.0-flash"})
+                        _model = genai.GenerativeModel("gemini-2.0-flash")
+    return _model
+
+def detect(text):
+    from langdetect import detect as _detect
+    with stage("langdetect"):
+        return _detect(text)
+
+# ======================================================
+# STARTUP WARM-UP
+# ======================================================
+readiness = Readiness("main")
 
-genai.configure(api_key=GEMINI_API_KEY)
+def warm_up(r):
+    r.step("import_yfinance", __import__, "yfinance", required=True)
+    r.step("gemini_model", get_model, required=True)
+    # The first detect() call loads every language profile from disk
+    r.step("langdetect_profiles", detect, "warming up the language detector")
 
-# Robust Model Loading
-try:
-    print("🧠 Attempting to load Gemini 2.0 Flash-Lite")
-    model = genai.GenerativeModel("gemini-2.0-flash-lite-preview-02-05")
-except Exception:
-    print("⚠️ Falling back to Gemini 1.0 Pro...")
-    model = genai.GenerativeModel("gemini-2.0-flash")
+@asynccontextmanager
+async def lifespan(app):
+    readiness.start(warm_up)
+    yield
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+instrument_app(app, "main")
+add_profiling_routes(app)
 
 origins = [
     "http://localhost:3000",
@@ -56,20 +102,22 @@ MEMORY_DB = {}
 # 2. GEMINI TECHNICAL ANALYSIS
 # ======================================================
 def get_gemini_technical_analysis(ticker: str):
-    print(f"🧠 Asking Gemini to read charts for {ticker}...")
+    log.info("Asking Gemini to read charts", extra={"ticker": ticker})
 
     try:
-        stock = yf.Ticker(ticker)
-        df = stock.history(period="3mo", auto_adjust=True)
+        import yfinance as yf
+        with upstream("yfinance"):
+            stock = yf.Ticker(ticker)
+            df = stock.history(period="3mo", auto_adjust=True)
 
         if df.empty:
             raise ValueError("Empty data")
 
         df_str = df[["Open", "High", "Low", "Close", "Volume"]].tail(60).to_string()
-        print("   ✅ Real market data fetched.")
+        log.debug("Real market data fetched", extra={"ticker": ticker, "rows": len(df)})
 
     except Exception as e:
-        print(f"   ⚠️ Yahoo error ({e}). Using backup data.")
+        log.warning("Yahoo error, using backup data", extra={"ticker": ticker, "error": str(e)})
         df_str = "Date: 2024-01-01, Open: 150, Close: 155, Volume: 1000000"
 
     try:
@@ -80,11 +128,13 @@ def get_gemini_technical_analysis(ticker: str):
         - tech_score (number 0–50)
         - pattern_name (string)
         """
-        response = model.generate_content(prompt)
+        model = get_model()
+        with upstream("gemini"):
+            response = model.generate_content(prompt)
         clean_json = response.text.replace("```json", "").replace("```", "").strip()
         return json.loads(clean_json)
     except Exception as e:
-        print(f"❌ Gemini parsing error: {e}")
+        log.error("Gemini parsing error", extra={"ticker": ticker, "error": str(e)})
         return {"tech_score": 25, "pattern_name": "Analysis Unavailable"}
 
 # ======================================================
@@ -159,14 +209,19 @@ def check_status(scan_id: str):
 # 5. DASHBOARDS
 # ======================================================
 
+def request_ticker(kwargs):
+    return kwargs["data"].get("ticker")
+
 @app.post("/api/get_news_headlines")
+@profiled("/api/get_news_headlines", symbol_from=request_ticker)
 def get_news_headlines(data: dict):
     ticker = data['ticker']
     day_offset = data.get('day_offset', 3)
     from_date = (datetime.datetime.now() - datetime.timedelta(days=day_offset)).strftime('%Y-%m-%d')
 
     url = f"https://newsapi.org/v2/everything?q={ticker}&from={from_date}&sortBy=popularity&apiKey={NEWS_API_KEY}"
-    response = requests.get(url)
+    with upstream("newsapi"):
+        response = requests.get(url)
     articles = response.json().get('articles', [])
     
     # Simple lang filter
@@ -174,6 +229,7 @@ def get_news_headlines(data: dict):
     return {"articles": en_articles}
 
 @app.post("/api/get_congress_activity")
+@profiled("/api/get_congress_activity", symbol_from=request_ticker)
 def get_congress_activity(data: dict):
     ticker = data['ticker']
     page = data.get('page', 1)
@@ -182,7 +238,8 @@ def get_congress_activity(data: dict):
     # Get congress stock sales
     url = f"https://openapi.ainvest.com/open/ownership/congress?ticker={ticker}&page={page}&size={size}"
     headers = {"Authorization": f"Bearer {AI_INVEST_TOKEN}"}
-    response = requests.get(url, headers=headers)
+    with upstream("ainvest"):
+        response = requests.get(url, headers=headers)
 
     congress_data = response.json()['data']['data']
 
@@ -213,7 +270,8 @@ def get_wikipedia_image(person_name):
         "piprop": "original"
     }
     
-    response = requests.get(search_url, params=search_params, headers=headers)
+    with upstream("wikipedia"):
+        response = requests.get(search_url, params=search_params, headers=headers)
     data = response.json()
     pages = data['query']['pages']
     
@@ -224,7 +282,15 @@ def get_wikipedia_image(person_name):
     return None
 
 # ======================================================
-# 6. RUN
+# 6. HEALTH
+# ======================================================
+@app.get("/ready")
+def ready():
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# ======================================================
+# 7. RUN
 # ======================================================
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,11 +1,67 @@
+from services.readiness import Readiness  # first import: marks process start for the startup budget
 import os
-from fastapi import FastAPI, Query
+import importlib
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-import importlib.util
-from fetch_history.history_pipeline import predict_today  # ML model
+from fastapi.responses import JSONResponse, StreamingResponse
+from fetch_history.jobs import get_job_queue, QueueFull
+from fetch_history.quotes import get_quote_hub
+from fetch_history.signals import get_signal_table
+from services.log import configure_logging
+from services.metrics import cache_result, instrument_app
+from services.profiling import add_profiling_routes, profile_call, profiled
+import asyncio
+import json
+import logging
+
+configure_logging()
+log = logging.getLogger("main2")
+
+# Set your consistent stock directory here
+STOCK_DIR = os.getenv("STOCK_DATA_DIR", os.path.join(os.path.dirname(__file__), "fetch_history", "stocks_data"))
+
+# Idle SSE connections get a comment line this often so proxies keep them open
+QUOTE_HEARTBEAT_SECONDS = float(os.getenv("QUOTE_HEARTBEAT_SECONDS", "15"))
+
+# Symbols whose models are loaded before /ready flips, e.g. "AAPL,MSFT,NVDA"
+WARMUP_SYMBOLS = [s.strip().upper() for s in os.getenv("WARMUP_SYMBOLS", "").split(",") if s.strip()]
+
+# The ML stack (torch, pandas, sklearn) is imported on first use or by the
+# startup warm-up, so the server binds its port without paying for it.
+def pipeline():
+    return importlib.import_module("fetch_history.history_pipeline")
+
+def math_predict():
+    return importlib.import_module("fetch_history.math_predict")
+
+def warm_up(r):
+    hp = r.step("import_ml_stack", pipeline, required=True)
+    r.step("import_math_predict", math_predict, required=True)
+    r.step("signal_table", get_signal_table().get, "")
+    if hp is None:
+        return
+    r.step("inference_executor", importlib.import_module("fetch_history.inference").get_executor)
+    for symbol in WARMUP_SYMBOLS:
+        stock_dir = os.path.join(STOCK_DIR, symbol)
+        if not hp.artifacts_ready(symbol, stock_dir):
+            log.warning("No trained artifacts for warm-up symbol", extra={"symbol": symbol})
+            continue
+        # A full prediction loads the model into the cache and runs one forward pass
+        r.step(f"predict_{symbol}", hp.predict_today, symbol, stock_dir)
+
+readiness = Readiness("main2")
+
+@asynccontextmanager
+async def lifespan(app):
+    readiness.start(warm_up)
+    yield
 
 # Initialize FastAPI app and middleware at the top
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+instrument_app(app, "main2")
+add_profiling_routes(app)
 
 # Allow frontend to call the API
 app.add_middleware(
@@ -16,29 +72,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Set your consistent stock directory here
-STOCK_DIR = os.path.join(os.path.dirname(__file__), "fetch_history", "stocks_data")
-
 
 # Math-based recommendation endpoint
 @app.get("/MathFormula")
-def get_math_recommendation(symbol: str = Query(..., description="Stock symbol to predict")):
+@profiled("/MathFormula")
+def get_math_recommendation(
+    symbol: str = Query(..., description="Stock symbol to predict"),
+    fresh: bool = Query(False, description="Skip the nightly signals table and compute now"),
+):
     """
     Returns math-based recommendation for a given symbol.
-    Dynamically constructs the features file path and uses math_predict.
+    Served from the nightly signals table when it has a current row for the
+    symbol (see SIGNAL_MAX_AGE_HOURS); otherwise (or with fresh=true) uses
+    math_predict on the symbol's features file.
     """
     try:
         # Always use uppercase for symbol
         symbol = symbol.upper()
-        stock_dir = os.path.join(STOCK_DIR, symbol)
-        features_file = os.path.join(stock_dir, f"{symbol}_features_reg.csv")
-
-        # Dynamically import math_predict
-        math_predict_path = os.path.join(os.path.dirname(__file__), "fetch_history", "math_predict.py")
-        spec = importlib.util.spec_from_file_location("math_predict", math_predict_path)
-        math_predict = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(math_predict)
-        result = math_predict.predict_last_date(symbol)
+        if not fresh:
+            row = get_signal_table().get(symbol)
+            cache_result("signals_math", bool(row and row["math_decision"]))
+            if row and row["math_decision"]:
+                return {"recommendation": row["math_decision"], "as_of": row["as_of"]}
+
+        result = math_predict().predict_last_date(symbol)
         return {"recommendation": result}
     except Exception as e:
         return {"error": str(e)}
@@ -46,23 +103,155 @@ def get_math_recommendation(symbol: str = Query(..., description="Stock symbol t
 
 
 @app.get("/GRURegressor")
-def get_recommendation(symbol: str = Query(..., description="Stock symbol to predict")):
+@profiled("/GRURegressor")
+def get_recommendation(
+    symbol: str = Query(..., description="Stock symbol to predict"),
+    model: Optional[str] = Query(None, description="'symbol' for the per-symbol model, 'global' for the shared model"),
+    fresh: bool = Query(False, description="Skip the nightly signals table and compute now"),
+):
     """
     Returns recommendation for a given symbol.
-    Dynamically constructs the model, scaler, and features file paths.
+    Served from the nightly signals table when it has a current signal from
+    the requested model; fresh=true always computes. Warm symbols are answered
+    inline. Symbols without trained artifacts are queued as a background
+    pipeline job: the response is 202 with a job ID to poll at
+    /jobs/{job_id}, or 503 when the job queue is full. An unknown model is a
+    400 and a missing global model a 503, both without queueing a job.
     """
     try:
         # Always use uppercase for symbol
         symbol = symbol.upper()
         stock_dir = os.path.join(STOCK_DIR, symbol)
-        
-        # Construct paths based on the symbol
-        model_path = os.path.join(stock_dir, f"{symbol}_reg_model.pth")
-        scaler_path = os.path.join(stock_dir, f"{symbol}_scaler.save")
-        features_file = os.path.join(stock_dir, f"{symbol}_features_reg.csv")
-        
-        result = predict_today(symbol, stock_dir)
-        return {"recommendation": result}
 
+        if not fresh:
+            row = get_signal_table().get(symbol)
+            hit = bool(row and row["gru_decision"] and (model is None or row["model_kind"] == model))
+            cache_result("signals_gru", hit)
+            if hit:
+                return {"recommendation": row["gru_decision"], "as_of": row["as_of"]}
+
+        hp = pipeline()
+        model_kind = model or hp.GRU_MODEL
+        if model_kind not in hp.MODEL_KINDS:
+            return JSONResponse(status_code=400, content={"error": f"Unknown model {model_kind!r}, expected one of {hp.MODEL_KINDS}"})
+        if hp.artifacts_ready(symbol, stock_dir, model):
+            result = hp.predict_today(symbol, stock_dir, model_kind=model)
+            return {"recommendation": result}
+
+        # The pipeline job can build features but not the shared model, so fail now instead of queueing
+        if model_kind == "global":
+            model_path = hp.global_model_path(os.path.abspath(STOCK_DIR))
+            if not os.path.exists(model_path):
+                return JSONResponse(status_code=503, content={"error": f"Global model not found at {model_path}. Train it with global_model.py."})
+
+        try:
+            # Profilable as route "/GRURegressor/job": the cold-symbol pipeline runs here, off the request thread
+            job = get_job_queue().submit(
+                (symbol, model), profile_call, "/GRURegressor/job", symbol,
+                hp.predict_today, symbol, stock_dir, model_kind=model,
+            )
+        except QueueFull as e:
+            return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "30"})
+        job["status_url"] = f"/jobs/{job['job_id']}"
+        return JSONResponse(status_code=202, content=job)
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Returns status and, once finished, the result of a background pipeline job.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job ID not found")
+    return job
+
+
+@app.get("/GRURegressor/history")
+@profiled("/GRURegressor/history")
+def get_prediction_history(
+    symbol: str = Query(..., description="Stock symbol to predict"),
+    months: int = Query(12, ge=1, description="How many months back to predict"),
+):
+    """
+    Returns the GRU prediction overlay (predicted 5-day return, ATR threshold
+    and decision) for every trading day in the last `months` months.
+    """
+    try:
+        symbol = symbol.upper()
+        stock_dir = os.path.join(STOCK_DIR, symbol)
+        import pandas as pd
+        start = (pd.Timestamp.today().normalize() - pd.DateOffset(months=months)).date()
+        return {"symbol": symbol, "predictions": pipeline().predict_range(symbol, stock_dir, start=start)}
     except Exception as e:
         return {"error": str(e)}
+
+
+@app.get("/GRURegressor/stats")
+def get_inference_stats():
+    """
+    Returns queue depth and batching stats for the GRU inference executor
+    and the background pipeline job queue.
+    """
+    from fetch_history.inference import get_executor
+    return {"inference": get_executor().stats(), "jobs": get_job_queue().stats()}
+
+
+@app.get("/quotes/stream")
+async def stream_quotes(
+    request: Request,
+    symbol: str = Query(..., description="Stock symbol to stream"),
+    backfill: int = Query(100, ge=0, description="How many buffered recent bars to send first"),
+):
+    """
+    Server-sent events stream of closed 1-minute bars with incremental
+    indicators. All viewers of a symbol share one upstream poll loop.
+    A malformed symbol is a 400 and one without quotes a 404.
+    """
+    hub = get_quote_hub()
+    try:
+        symbol = await hub.open(symbol)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def events():
+        async with hub.subscribe(symbol) as (recent, queue):
+            for bar in recent[-backfill:] if backfill else []:
+                yield f"event: bar\ndata: {json.dumps(bar)}\n\n"
+            # Stop as soon as the client goes, so its subscription is released
+            while not await request.is_disconnected():
+                try:
+                    bar = await asyncio.wait_for(queue.get(), timeout=QUOTE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: bar\ndata: {json.dumps(bar)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/quotes/stats")
+async def get_quote_stats():
+    """
+    Returns subscribers, buffered bars and upstream poll counts per streamed symbol.
+    """
+    return get_quote_hub().stats()
+
+
+@app.get("/ready")
+def get_ready():
+    """
+    Readiness probe: 503 until the startup warm-up (ML imports, hot-symbol
+    models, signals table) has finished, then 200 with startup timings.
+    """
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
@@ -1,14 +1,17 @@
 import requests
 import json
+import logging
 import os
 from dotenv import load_dotenv
+from services.metrics import upstream
 
 load_dotenv()
 GUMLOOP_WEBHOOK_URL = os.getenv("GUMLOOP_WEBHOOK_URL")
+log = logging.getLogger(__name__)
 
 def trigger_gumloop_flow(scan_id: str, ticker: str):
     if not GUMLOOP_WEBHOOK_URL:
-        print("❌ ERROR: GUMLOOP_WEBHOOK_URL is missing")
+        log.error("GUMLOOP_WEBHOOK_URL is missing")
         return False
 
     # --- CHANGE HERE: Match the exact names from your Gumloop Start Node ---
@@ -19,12 +22,13 @@ def trigger_gumloop_flow(scan_id: str, ticker: str):
     
     headers = {"Content-Type": "application/json"}
 
-    print(f"📡 Dispatching Gumloop Agent for {ticker}...")
+    log.info("Dispatching Gumloop agent", extra={"ticker": ticker, "scan_id": scan_id})
 
     try:
-        requests.post(GUMLOOP_WEBHOOK_URL, data=json.dumps(payload), headers=headers, timeout=5)
-        print(f"✅ Agent Dispatched (ID: {scan_id})")
+        with upstream("gumloop"):
+            requests.post(GUMLOOP_WEBHOOK_URL, data=json.dumps(payload), headers=headers, timeout=5)
+        log.info("Agent dispatched", extra={"scan_id": scan_id})
         return True
     except Exception as e:
-        print(f"❌ Failed to dispatch agent: {e}")
+        log.error("Failed to dispatch agent", extra={"scan_id": scan_id, "error": str(e)})
         return False
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms) rendered in
+the text exposition format, plus the shared hot-path metrics used by both
+FastAPI apps and the ML pipeline.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt_value(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        REGISTRY.register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        # Label-less metrics act as their own single child
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_fmt_labels(labelnames, key)} {_fmt_value(self._value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def __init__(self):
+        super().__init__()
+        self._fn = None
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set_function(self, fn):
+        """Read the value from fn() at scrape time instead of storing it."""
+        self._fn = fn
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def render(self, name, labelnames, key):
+        value = self._fn() if self._fn is not None else self._value
+        return [f"{name}{_fmt_labels(labelnames, key)} {_fmt_value(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, fn):
+        self._default().set_function(fn)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * len(buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self._buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines, cumulative = [], 0
+        for bound, c in zip(self._buckets, counts):
+            cumulative += c
+            lines.append(f"{name}_bucket{_fmt_labels(labelnames, key, [('le', _fmt_value(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labelnames, key)} {_fmt_value(total)}")
+        lines.append(f"{name}_count{_fmt_labels(labelnames, key)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------- shared hot-path metrics ----------
+STAGE_SECONDS = Histogram(
+    "sentitrade_stage_seconds",
+    "Time spent in one stage of a request or pipeline run",
+    ["stage"],
+)
+UPSTREAM_SECONDS = Histogram(
+    "sentitrade_upstream_seconds",
+    "Latency of calls to external providers",
+    ["provider"],
+)
+UPSTREAM_ERRORS = Counter(
+    "sentitrade_upstream_errors_total",
+    "Failed calls to external providers",
+    ["provider"],
+)
+CACHE_REQUESTS = Counter(
+    "sentitrade_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "sentitrade_http_request_seconds",
+    "HTTP request latency",
+    ["app", "method", "route", "status"],
+)
+HTTP_INFLIGHT = Gauge(
+    "sentitrade_http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["app"],
+)
+
+
+def stage(name):
+    """Context manager timing one stage into sentitrade_stage_seconds."""
+    return STAGE_SECONDS.labels(stage=name).time()
+
+
+@contextmanager
+def upstream(provider):
+    """Time an external call and count it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(provider=provider).inc()
+        raise
+    finally:
+        UPSTREAM_SECONDS.labels(provider=provider).observe(time.perf_counter() - started)
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+class _MetricsMiddleware:
+    """
+    Pure ASGI request latency/in-flight middleware. Unlike @app.middleware("http"),
+    it passes the client's disconnect straight through to streaming responses,
+    so an SSE stream ends (and leaves the in-flight gauge) as soon as the client goes.
+    """
+
+    def __init__(self, app, app_name):
+        self.app = app
+        self.app_name = app_name
+        self.inflight = HTTP_INFLIGHT.labels(app=app_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status):
+            nonlocal observed
+            observed = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                app=self.app_name,
+                method=scope["method"],
+                # Route templates, not raw paths, to keep label cardinality bounded
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            ).observe(time.perf_counter() - started)
+
+        async def send_wrapper(message):
+            # Latency is time to the response headers, so long-lived streams don't skew it
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+
+        self.inflight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.inflight.dec()
+            if not observed:
+                observe(500)
+
+
+def instrument_app(app, app_name):
+    """Add request latency/in-flight middleware and a /metrics route to a FastAPI app."""
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(_MetricsMiddleware, app_name=app_name)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
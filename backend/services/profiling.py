@@ -0,0 +1,339 @@
+"""
+Opt-in, on-demand profiling of live requests.
+
+Disabled unless PROFILE_TOKEN is set. An operator arms a capture with
+POST /debug/profile (route and/or symbol, number of requests, mode) and the
+next matching calls of @profiled endpoints are profiled in the thread that
+serves them. GET /debug/profile/{capture_id} returns the merged result as
+collapsed stacks (flamegraph.pl, speedscope) or a pstats dump. While nothing
+is armed, a profiled endpoint costs one list check per call.
+
+Modes:
+- "sample": a sampler thread reads the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL_MS. Low overhead, safe on slow production requests.
+  Work the request hands to a shared worker thread (the GRU forward pass runs
+  on "inference-worker") is sampled too, under a "[thread-name]" root frame,
+  while the worker is busy. Those samples include any other requests batched
+  with the profiled one.
+- "cprofile": deterministic cProfile of every function call. Exact call counts,
+  but much higher overhead; one request is traced at a time. It only traces
+  the request thread, so work done on worker threads shows up as time
+  waiting on a Future; use "sample" mode to see inside it.
+"""
+import cProfile
+import functools
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+MAX_REQUESTS = 50
+MAX_ARMED = 8
+CAPTURE_TTL_SECONDS = 3600
+MODES = ("sample", "cprofile")
+
+_lock = threading.Lock()
+_armed = []      # captures still waiting for matching requests
+_captures = {}   # capture id -> Capture, kept for CAPTURE_TTL_SECONDS
+# cProfile can only trace one call at a time on newer Pythons
+_cprofile_lock = threading.Lock()
+
+# Shared worker threads sampled alongside the request thread: thread name ->
+# the frame that marks real work (samples of an idle worker are skipped)
+WORKER_THREADS = {"inference-worker": "_run_group"}
+
+
+class Capture:
+    def __init__(self, route=None, symbol=None, count=1, mode="sample", interval_ms=SAMPLE_INTERVAL_MS):
+        self.id = uuid.uuid4().hex
+        self.route = route
+        self.symbol = symbol.upper() if symbol else None
+        self.count = count
+        self.mode = mode
+        self.interval = interval_ms / 1000.0
+        self.remaining = count
+        self.inflight = 0
+        self.created = time.time()
+        self.requests = []
+        self.stacks = Counter()
+        self.stats = None
+
+    @property
+    def finished(self):
+        return self.remaining == 0 and self.inflight == 0
+
+    def matches(self, route, symbol):
+        if self.route is not None and self.route != route:
+            return False
+        if self.symbol is not None and (symbol or "").upper() != self.symbol:
+            return False
+        return True
+
+    def run(self, route, symbol, fn, args, kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            if self.mode == "cprofile":
+                result = self._run_cprofile(fn, args, kwargs)
+            else:
+                result = self._run_sampled(fn, args, kwargs)
+            status = "ok"
+            return result
+        finally:
+            with _lock:
+                self.inflight -= 1
+                self.requests.append({
+                    "route": route,
+                    "symbol": symbol,
+                    "seconds": round(time.perf_counter() - started, 6),
+                    "status": status,
+                })
+
+    def _run_sampled(self, fn, args, kwargs):
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sample_thread,
+            args=(threading.get_ident(), _worker_thread_ids(), self.interval, stop, self.stacks),
+            name="profile-sampler",
+            daemon=True,
+        )
+        sampler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stop.set()
+            sampler.join()
+
+    def _run_cprofile(self, fn, args, kwargs):
+        with _cprofile_lock:
+            prof = cProfile.Profile()
+            try:
+                return prof.runcall(fn, *args, **kwargs)
+            finally:
+                with _lock:
+                    if self.stats is None:
+                        self.stats = pstats.Stats(prof)
+                    else:
+                        self.stats.add(prof)
+
+    def collapsed(self):
+        """Folded stacks, one `frame;frame;... count` line per distinct stack."""
+        with _lock:
+            stacks = sorted(self.stacks.items())
+        return "".join(f"{stack} {n}\n" for stack, n in stacks)
+
+    def pstats_dump(self):
+        """Bytes in the format written by pstats.Stats.dump_stats (load with pstats.Stats(path))."""
+        return marshal.dumps(self.stats.stats) if self.stats is not None else b""
+
+    def pstats_text(self, limit=50):
+        if self.stats is None:
+            return ""
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def summary(self):
+        with _lock:
+            return {
+                "capture_id": self.id,
+                "route": self.route,
+                "symbol": self.symbol,
+                "mode": self.mode,
+                "count": self.count,
+                "remaining": self.remaining,
+                "inflight": self.inflight,
+                "finished": self.finished,
+                "samples": sum(self.stacks.values()),
+                "requests": list(self.requests),
+            }
+
+
+_SAMPLED_CODE = Capture._run_sampled.__code__
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _worker_thread_ids():
+    """{thread id: (name, work frame name)} for the running WORKER_THREADS."""
+    return {
+        t.ident: (t.name, WORKER_THREADS[t.name])
+        for t in threading.enumerate()
+        if t.name in WORKER_THREADS and t.ident is not None
+    }
+
+
+def _worker_stack(frame, name, work_frame):
+    """Collapsed stack of a worker from its work frame down, or None if it is idle."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        if frame.f_code.co_name == work_frame:
+            return ";".join([f"[{name}]"] + labels[::-1])
+        frame = frame.f_back
+    return None
+
+
+def _sample_thread(thread_id, workers, interval, stop, stacks):
+    while not stop.wait(interval):
+        frames = sys._current_frames()
+        frame = frames.get(thread_id)
+        labels = []
+        # Walk up to (not including) the profiling wrapper so stacks start at the endpoint
+        while frame is not None and frame.f_code is not _SAMPLED_CODE:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        keys = [";".join(reversed(labels))] if labels else []
+        for worker_id, (name, work_frame) in workers.items():
+            key = _worker_stack(frames.get(worker_id), name, work_frame)
+            if key:
+                keys.append(key)
+        # A sample taken after the call returned would show the sampler's own join()
+        if keys and not stop.is_set():
+            with _lock:
+                for key in keys:
+                    stacks[key] += 1
+
+
+def arm(route=None, symbol=None, count=1, mode="sample", interval_ms=SAMPLE_INTERVAL_MS):
+    """Profile the next `count` calls matching route and/or symbol; returns the Capture."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if not 1 <= count <= MAX_REQUESTS:
+        raise ValueError(f"count must be between 1 and {MAX_REQUESTS}")
+    if interval_ms <= 0:
+        raise ValueError("interval_ms must be positive")
+    capture = Capture(route, symbol, count, mode, interval_ms)
+    with _lock:
+        _prune()
+        if len(_armed) >= MAX_ARMED:
+            raise ValueError(f"{len(_armed)} captures already armed (limit {MAX_ARMED})")
+        _armed.append(capture)
+        _captures[capture.id] = capture
+    return capture
+
+
+def get_capture(capture_id):
+    with _lock:
+        return _captures.get(capture_id)
+
+
+def _prune():
+    cutoff = time.time() - CAPTURE_TTL_SECONDS
+    for capture in [c for c in _captures.values() if c.created < cutoff]:
+        del _captures[capture.id]
+        if capture in _armed:
+            _armed.remove(capture)
+
+
+def _claim(route, symbol):
+    with _lock:
+        for capture in _armed:
+            if capture.matches(route, symbol):
+                capture.remaining -= 1
+                capture.inflight += 1
+                if capture.remaining == 0:
+                    _armed.remove(capture)
+                return capture
+    return None
+
+
+def profile_call(route, symbol, fn, /, *args, **kwargs):
+    """Call fn(*args, **kwargs), profiling it if an armed capture matches route/symbol."""
+    if not _armed:
+        return fn(*args, **kwargs)
+    capture = _claim(route, symbol)
+    if capture is None:
+        return fn(*args, **kwargs)
+    return capture.run(route, symbol, fn, args, kwargs)
+
+
+def profiled(route, symbol_from=lambda kwargs: kwargs.get("symbol")):
+    """
+    Decorator for sync endpoints: make calls profilable under `route`.
+    `symbol_from` picks the symbol out of the endpoint's keyword arguments.
+    Put it below the @app.get/@app.post decorator.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _armed:
+                return fn(*args, **kwargs)
+            try:
+                symbol = symbol_from(kwargs)
+            except Exception:
+                symbol = None
+            return profile_call(route, symbol, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_profiling_routes(app):
+    """Register /debug/profile on a FastAPI app when PROFILE_TOKEN is set."""
+    if not PROFILE_TOKEN:
+        return
+
+    from typing import Optional
+    from fastapi import Header, HTTPException, Query
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+    def check_token(token):
+        if not token or not hmac.compare_digest(token, PROFILE_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid profile token")
+
+    @app.post("/debug/profile", include_in_schema=False)
+    def arm_profile(
+        route: Optional[str] = Query(None, description="Route template to match, e.g. /GRURegressor"),
+        symbol: Optional[str] = Query(None, description="Symbol to match"),
+        count: int = Query(1, description="How many matching requests to profile"),
+        mode: str = Query("sample", description="'sample' (collapsed stacks) or 'cprofile' (pstats)"),
+        interval_ms: float = Query(SAMPLE_INTERVAL_MS, description="Sampling interval in sample mode"),
+        x_profile_token: Optional[str] = Header(None),
+    ):
+        check_token(x_profile_token)
+        if route is None and symbol is None:
+            raise HTTPException(status_code=400, detail="Give a route, a symbol or both")
+        try:
+            capture = arm(route, symbol, count, mode, interval_ms)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        summary = capture.summary()
+        summary["result_url"] = f"/debug/profile/{capture.id}"
+        return summary
+
+    @app.get("/debug/profile/{capture_id}", include_in_schema=False)
+    def get_profile(
+        capture_id: str,
+        format: Optional[str] = Query(None, description="collapsed (sample mode), pstats or text (cprofile mode)"),
+        x_profile_token: Optional[str] = Header(None),
+    ):
+        check_token(x_profile_token)
+        capture = get_capture(capture_id)
+        if capture is None:
+            raise HTTPException(status_code=404, detail="Capture not found")
+        if not capture.finished:
+            return JSONResponse(status_code=202, content=capture.summary())
+
+        fmt = format or ("collapsed" if capture.mode == "sample" else "text")
+        if capture.mode == "sample" and fmt == "collapsed":
+            return PlainTextResponse(capture.collapsed())
+        if capture.mode == "cprofile" and fmt == "text":
+            return PlainTextResponse(capture.pstats_text())
+        if capture.mode == "cprofile" and fmt == "pstats":
+            return Response(
+                capture.pstats_dump(),
+                media_type="application/octet-stream",
+                headers={"Content-Disposition": f'attachment; filename="{capture.id}.prof"'},
+            )
+        raise HTTPException(status_code=400, detail=f"format {fmt!r} is not available for {capture.mode} captures")
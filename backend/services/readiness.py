@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+import time
+
+# Taken when the app module first imports this file, i.e. before its heavy imports
+PROCESS_START = time.monotonic()
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "15"))
+log = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Tracks an app's warm-up. `start()` runs the warm-up function in a
+    background thread so the server can accept connections (and answer
+    liveness checks) immediately; `status()` reports ready only once it ends
+    and no required step has failed.
+    """
+
+    def __init__(self, name, budget_seconds=STARTUP_BUDGET_SECONDS):
+        self.name = name
+        self.budget_seconds = budget_seconds
+        self.ready = False
+        self.error = None
+        self.import_seconds = None
+        self.warmup_seconds = None
+        self.ready_seconds = None
+        self.steps = {}
+        self.failed_steps = []
+
+    def start(self, warmup):
+        self.import_seconds = time.monotonic() - PROCESS_START
+        threading.Thread(target=self._run, args=(warmup,), name=f"{self.name}-warmup", daemon=True).start()
+
+    def step(self, label, fn, *args, required=False):
+        """
+        Run one warm-up step, recording its duration. A failed optional step is
+        logged; a failed required step also keeps the app from reporting ready.
+        """
+        started = time.monotonic()
+        try:
+            return fn(*args)
+        except Exception as e:
+            fields = {"app": self.name, "step": label, "error": str(e)}
+            if required:
+                self.failed_steps.append(label)
+                self.error = f"required warm-up step {label} failed: {e}"
+                log.error("Required warm-up step failed", extra=fields)
+            else:
+                log.warning("Warm-up step failed", extra=fields)
+        finally:
+            self.steps[label] = round(time.monotonic() - started, 4)
+
+    def _run(self, warmup):
+        started = time.monotonic()
+        try:
+            warmup(self)
+        except Exception as e:
+            self.error = str(e)
+            log.exception("Warm-up failed", extra={"app": self.name})
+        self.warmup_seconds = time.monotonic() - started
+        self.ready_seconds = time.monotonic() - PROCESS_START
+        fields = {"app": self.name, "ready_seconds": round(self.ready_seconds, 3), "budget_seconds": self.budget_seconds}
+        if self.error is not None:
+            log.error("Not ready: warm-up failed", extra={**fields, "error": self.error})
+            return
+        self.ready = True
+        if self.ready_seconds > self.budget_seconds:
+            log.warning("Ready after startup budget was exceeded", extra=fields)
+        else:
+            log.info("Ready", extra=fields)
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "ready_seconds": self.ready_seconds,
+            "budget_seconds": self.budget_seconds,
+            "steps": self.steps,
+            "failed_steps": self.failed_steps,
+        }
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from bench.synthetic import make_ohlcv
+from fetch_history import global_model
+from fetch_history.features import build_features
+from fetch_history.train_model import FEATURES, SEQ_LEN, make_sequences
+
+END = pd.Timestamp("2024-06-28")
+
+
+def test_window_batches_match_make_sequences():
+    rng = np.random.default_rng(0)
+    a, b = rng.random((90, 3), dtype=np.float32), rng.random((75, 3), dtype=np.float32)
+    values = torch.from_numpy(np.concatenate([a, b]))
+    starts = torch.from_numpy(np.concatenate([np.arange(90 - SEQ_LEN), 90 + np.arange(75 - SEQ_LEN)]))
+
+    windows = torch.cat([xb for _, xb in global_model.window_batches(values, starts, 7, shuffle=False)])
+    expected = np.concatenate([make_sequences(x, np.zeros(len(x)))[0] for x in (a, b)])
+    np.testing.assert_array_equal(windows.numpy(), expected)
+
+
+def test_train_and_predict_inputs(tmp_path):
+    for seed, symbol in enumerate(["AAA", "BBB"]):
+        (tmp_path / symbol).mkdir()
+        build_features(make_ohlcv(300, seed=seed, end=END)).to_csv(tmp_path / symbol / f"{symbol}_features_reg.csv")
+    global_model.train_global(["AAA", "BBB"], str(tmp_path), epochs=1)
+
+    model, vocab, scalers = global_model.load_global_model(str(tmp_path))
+    assert vocab == {"AAA": 1, "BBB": 2}
+    assert global_model.symbol_inputs("BBB", vocab, scalers) == (2, scalers["BBB"])
+
+    # Unseen symbols need a scaler fitted on their full history up front
+    with pytest.raises(KeyError):
+        global_model.symbol_inputs("CCC", vocab, scalers)
+    df = build_features(make_ohlcv(300, seed=9, end=END))
+    idx, scaler = global_model.symbol_inputs("CCC", vocab, {**scalers, "CCC": global_model.fit_symbol_scaler(df)})
+    assert idx == global_model.UNKNOWN_SYMBOL
+    assert scaler.n_features_in_ == len(FEATURES)
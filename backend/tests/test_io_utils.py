@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+from bench.synthetic import make_ohlcv
+from fetch_history.io_utils import read_csv_tail
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "AAA_data.csv"
+    make_ohlcv(400, end=pd.Timestamp("2024-06-28")).to_csv(path)
+    return path
+
+
+@pytest.mark.parametrize("rows", [1, 60, 400, 1000])
+def test_tail_matches_full_read(csv_path, rows):
+    full = pd.read_csv(csv_path, parse_dates=["Date"], index_col="Date")
+    tail = read_csv_tail(csv_path, rows, ["Close", "Volume"])
+    pd.testing.assert_frame_equal(tail, full[["Close", "Volume"]].iloc[-rows:])
+
+
+def test_tail_across_blocks(csv_path, monkeypatch):
+    monkeypatch.setattr("fetch_history.io_utils.TAIL_BLOCK_SIZE", 64)
+    full = pd.read_csv(csv_path, parse_dates=["Date"], index_col="Date")
+    pd.testing.assert_frame_equal(read_csv_tail(csv_path, 30), full.iloc[-30:])
+
+
+@pytest.mark.parametrize("rows", [0, -1])
+def test_non_positive_rows_rejected(csv_path, rows):
+    with pytest.raises(ValueError):
+        read_csv_tail(csv_path, rows)
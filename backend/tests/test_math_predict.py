@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+from fetch_history import math_predict, sweep
+from fetch_history.features import CONSUMER_COLS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_leaves_warning_filters_alone():
+    # In a fresh interpreter: features.py (imported by other tests) silences warnings globally
+    code = (
+        "import warnings; before = list(warnings.filters); "
+        "import fetch_history.math_predict; "
+        "assert warnings.filters == before, warnings.filters[:2]"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=BACKEND_DIR)
+
+
+def test_math_columns_shared():
+    assert math_predict.MATH_COLS == CONSUMER_COLS["math"] == sweep.MATH_COLUMNS
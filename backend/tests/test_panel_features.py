@@ -0,0 +1,86 @@
+"""
+Panel features must match the original single-symbol features.py output,
+column for column, including for symbols that list late or miss a bar.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.synthetic import make_ohlcv
+from fetch_history.features import FEATURE_COLS, PERSISTED_COLS
+from fetch_history.panel_features import build_panel_features, load_ohlcv
+
+END = pd.Timestamp("2024-06-28")
+
+
+def reference_features(df):
+    """Column definitions of features.py before the shared indicators() refactor."""
+    df = df.astype(float)
+    df["ret_1d"] = df["Close"].pct_change()
+    df["ret_5d"] = df["Close"].pct_change(5)
+    df["sma_10"] = df["Close"].rolling(10).mean()
+    df["sma_20"] = df["Close"].rolling(20).mean()
+    df["sma_50"] = df["Close"].rolling(50).mean()
+    df["trend_50"] = df["Close"] / df["sma_50"]
+    delta = df["Close"].diff()
+    gain = delta.clip(lower=0).rolling(14).mean()
+    loss = -delta.clip(upper=0).rolling(14).mean()
+    df["RSI"] = 100 - (100 / (1 + gain / loss))
+    ema12 = df["Close"].ewm(span=12).mean()
+    ema26 = df["Close"].ewm(span=26).mean()
+    df["MACD"] = ema12 - ema26
+    tr = pd.concat([
+        df["High"] - df["Low"],
+        (df["High"] - df["Close"].shift()).abs(),
+        (df["Low"] - df["Close"].shift()).abs()
+    ], axis=1).max(axis=1)
+    df["ATR"] = tr.rolling(14).mean()
+    df["ATR_pct"] = df["ATR"] / df["Close"]
+    df["vol_chg"] = df["Volume"].pct_change()
+    df["vol_norm"] = df["Volume"] / df["Volume"].rolling(20).mean()
+    df["target"] = np.log(df["Close"].shift(-5) / df["Close"])
+    df.dropna(subset=[
+        "ret_1d", "ret_5d", "sma_10", "sma_20", "sma_50", "trend_50",
+        "RSI", "MACD", "ATR", "ATR_pct", "vol_chg", "vol_norm"
+    ], inplace=True)
+    return df
+
+
+@pytest.fixture
+def data_root(tmp_path):
+    frames = {
+        "FULL": make_ohlcv(400, seed=1, end=END),
+        "OTHER": make_ohlcv(400, seed=2, end=END),
+        # Listed 250 bars after the others
+        "LATE": make_ohlcv(150, seed=3, end=END),
+        # One bar missing mid-series
+        "GAPPY": make_ohlcv(400, seed=4, end=END).drop(pd.bdate_range(end=END, periods=400)[200]),
+    }
+    for symbol, df in frames.items():
+        os.makedirs(tmp_path / symbol)
+        df.to_csv(tmp_path / symbol / f"{symbol}_data.csv")
+    return str(tmp_path)
+
+
+def assert_same(actual, expected):
+    assert actual.index.equals(expected.index)
+    assert list(actual.columns) == list(expected.columns)
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+def test_all_columns_match_reference(data_root):
+    symbols = ["FULL", "OTHER", "LATE", "GAPPY"]
+    results = build_panel_features(symbols, data_root, columns=FEATURE_COLS + ["target"])
+    assert sorted(results) == sorted(symbols)
+    for symbol in symbols:
+        assert_same(results[symbol], reference_features(load_ohlcv(symbol, data_root)))
+
+
+def test_default_columns_are_reference_subset(data_root):
+    symbols = ["FULL", "LATE", "GAPPY"]
+    results = build_panel_features(symbols, data_root)
+    for symbol in symbols:
+        expected = reference_features(load_ohlcv(symbol, data_root))
+        assert_same(results[symbol], expected[["Open", "High", "Low", "Close", "Volume"] + PERSISTED_COLS])
@@ -0,0 +1,86 @@
+"""
+/quotes/stream against the fake feed: bars arrive, and a client that drops the
+connection releases its subscription, the poll loop and the in-flight gauge.
+"""
+import asyncio
+import json
+
+import pytest
+
+import main2
+from fetch_history import quotes
+from services.metrics import HTTP_INFLIGHT
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = quotes.QuoteHub(quotes.FakeQuoteFeed(), poll_seconds=0.01, idle_seconds=0)
+    monkeypatch.setattr(quotes, "_hub", hub)
+    return hub
+
+
+async def stream(query, bars):
+    """Drive the app over ASGI, disconnecting once `bars` bar events have arrived."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/quotes/stream",
+        "raw_path": b"/quotes/stream",
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    gone = asyncio.Event()
+    requested = False
+    sent = {"status": None, "events": []}
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            for chunk in message.get("body", b"").decode().split("\n\n"):
+                if chunk.startswith("event: bar"):
+                    sent["events"].append(json.loads(chunk.split("data: ", 1)[1]))
+            if len(sent["events"]) >= bars:
+                gone.set()
+
+    await asyncio.wait_for(main2.app(scope, receive, send), timeout=5)
+    return sent
+
+
+def test_stream_sends_bars_and_cleans_up_on_disconnect(hub):
+    inflight = HTTP_INFLIGHT.labels(app="main2")
+
+    async def run():
+        sent = await stream("symbol=aapl&backfill=5", bars=8)
+        # Unsubscribed at once; the idle poll loop exits after its next sleep
+        assert hub.stats().get("AAPL", {"subscribers": 0})["subscribers"] == 0
+        await asyncio.sleep(0.1)
+        return sent
+
+    sent = asyncio.run(run())
+    assert sent["status"] == 200
+    assert all(e["symbol"] == "AAPL" for e in sent["events"])
+    assert len(sent["events"]) >= 8
+    assert hub.channels == {}
+    assert inflight._value == 0
+
+
+def test_invalid_symbol_starts_no_poll_loop(hub):
+    sent = asyncio.run(stream("symbol=not%20a%20ticker", bars=0))
+    assert sent["status"] == 400
+    assert hub.channels == {}
+    assert hub.feed.fetches == {}
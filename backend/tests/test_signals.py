@@ -0,0 +1,73 @@
+"""
+A freshly built signals table must be served: rows are only stale once their
+features or models are rebuilt after the table was generated.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from bench.synthetic import make_ohlcv
+# Imported up front, as build_signals does before its refresh step, so the
+# table is written within the same second as the features
+from fetch_history import history_pipeline, signals
+from fetch_history.io_utils import atomic_path
+from fetch_history.panel_features import build_panel_features, write_panel_features
+
+END = pd.Timestamp("2024-06-28")
+
+
+def write_prices(symbol, output_dir, rows=None):
+    """fetch_data.main stand-in writing synthetic prices; symbols starting with BAD fail."""
+    if symbol.startswith("BAD"):
+        raise RuntimeError(f"no such ticker {symbol}")
+    with atomic_path(os.path.join(output_dir, f"{symbol}_data.csv")) as tmp:
+        make_ohlcv(300, seed=len(symbol), end=END).to_csv(tmp)
+
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    fetch_data = pytest.importorskip("fetch_history.fetch_data")
+    monkeypatch.setattr(fetch_data, "main", write_prices)
+
+
+def refresh(symbols, data_root):
+    """The refresh step of build_signals without the network fetch."""
+    for symbol in symbols:
+        os.makedirs(os.path.join(data_root, symbol), exist_ok=True)
+        write_prices(symbol, os.path.join(data_root, symbol))
+    write_panel_features(build_panel_features(symbols, data_root), data_root)
+
+
+def test_fresh_build_is_served(tmp_path):
+    # Features written moments before the table, as in the nightly job
+    refresh(["AAA", "BBBB"], str(tmp_path))
+    rows = signals.build_signals(["AAA", "BBBB"], str(tmp_path), refresh=False)
+    table = signals.SignalTable(signals.signals_path(str(tmp_path)), reload_seconds=0)
+
+    for symbol in ("AAA", "BBBB"):
+        row = table.get(symbol)
+        assert row is not None
+        assert row["math_decision"] == rows[symbol]["math_decision"]
+        assert row["as_of"] == "2024-06-28"
+
+
+def test_bad_symbol_does_not_abort_build(tmp_path, fake_fetch):
+    rows = signals.build_signals(["AAA", "BADX"], str(tmp_path))
+    table = signals.SignalTable(signals.signals_path(str(tmp_path)), reload_seconds=0)
+
+    assert list(rows) == ["AAA"]
+    assert table.get("AAA") is not None
+    assert table.get("BADX") is None
+
+
+def test_rebuilt_features_make_row_stale(tmp_path):
+    refresh(["AAA"], str(tmp_path))
+    signals.build_signals(["AAA"], str(tmp_path), refresh=False)
+    table = signals.SignalTable(signals.signals_path(str(tmp_path)), reload_seconds=0)
+    assert table.get("AAA") is not None
+
+    features_file = tmp_path / "AAA" / "AAA_features_reg.csv"
+    later = table.get("AAA")["generated_ts"] + 1
+    os.utime(features_file, (later, later))
+    assert table.get("AAA") is None
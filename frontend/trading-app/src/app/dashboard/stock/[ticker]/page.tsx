@@ -297,7 +297,20 @@ export default function StockDetailPage() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
+      let data = await response.json();
+
+      // Cold symbols are trained in a background job: poll until it finishes
+      if (response.status === 202 && data.job_id) {
+        while (data.status === "queued" || data.status === "running") {
+          await new Promise((resolve) => setTimeout(resolve, 3000));
+          const jobResponse = await fetch(`http://127.0.0.1:8000/jobs/${data.job_id}`);
+          if (!jobResponse.ok) {
+            throw new Error(`HTTP error! status: ${jobResponse.status}`);
+          }
+          data = await jobResponse.json();
+        }
+        data = data.status === "done" ? { recommendation: data.result } : { error: data.error };
+      }
       
       if (data.error) {
         throw new Error(data.error);